@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WebmonConfig(AppConfig):
     name = 'WebMon'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,207 @@
+import itertools
+import os
+import platform
+import timeit
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from lxml import etree
+from rest_framework.test import APIClient
+
+from .cache import invalidate_watch
+from .ingest import ValueIngester
+from .models import Watch, Value
+from .scrapper import Scrapper
+from .serializers import WatchSerializer, ValueSerializer, WATCH_ROW_FIELDS, VALUE_ROW_FIELDS, watch_row_data, \
+    value_row_data
+
+PAGE_SIZES = (10 * 1024, 100 * 1024, 1024 * 1024)
+ENDPOINT_ROWS = (1000, 10000, 100000)
+
+# XPaths of increasing cost on pages from `make_page()`
+SCRAPPER_XPATHS = (
+    ('simple', '//h1/text()'),
+    ('positional', '(//td[@class="name"])[1]/text()'),
+    ('predicate', '//tr[td[@class="price"] > 98]/td[@class="name"]/text()'),
+    ('text_search', '//table//td[contains(., "77")]/text()'),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """ Run the block in a transaction which is rolled back afterwards, so synthetic rows are not kept. """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def measure(name: str, func, repeat: int, operations: int = 1, **info) -> dict:
+    """ Run `func` `repeat` times and return the best time in seconds, and `operations` done by `func` per second. """
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    result = {'name': name, 'seconds': seconds, 'per_second': operations / seconds if seconds else None}
+    result.update(info)
+    return result
+
+
+def get_environment() -> dict:
+    """ Describe where benchmarks ran, to tell apart results which are not comparable. """
+    return {
+        'time': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'lxml': '.'.join(map(str, etree.LXML_VERSION)),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def create_rows(rows: int):
+    """ Create a user with `rows` watches, and `rows` values of the first watch. Returns the user and the watch. """
+    user = User.objects.create(username='benchmark_user')
+    Watch.objects.bulk_create(
+        Watch(name='watch{}'.format(i), url='http://example.com/{}'.format(i), xpath='//h1/text()',
+              period=timedelta(hours=1), next_check=timezone.now(), owner=user)
+        for i in range(rows))
+    watch = user.watches.first()
+    now = timezone.now()
+    Value.objects.bulk_create(
+        Value(watch=watch, created=now - timedelta(seconds=rows - i), last_seen=now, content='value {}'.format(i))
+        for i in range(rows))
+    Watch.objects.filter(pk=watch.pk).update(latest_value=watch.values.order_by('-created').first())
+    return user, watch
+
+
+def make_page(size: int) -> str:
+    """ Return a synthetic page of about `size` bytes, with a heading and a table of products. """
+    rows, length = [], 0
+    for i in itertools.count():
+        row = '<tr><td class="name">Product {}</td><td class="price">{}</td></tr>'.format(i, i % 100)
+        rows.append(row)
+        length += len(row)
+        if length >= size:
+            break
+    return '<html><head><title>Products</title></head><body><h1>Products</h1><table>{}</table></body></html>'.format(
+        ''.join(rows))
+
+
+def load_corpus(path: str) -> list:
+    """ Return (name, content) of HTML files in directory `path`. """
+    pages = []
+    for name in sorted(os.listdir(path)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(path, name), encoding='utf-8', errors='replace') as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def bench_serializers(rows: int = 10000, repeat: int = 3) -> list:
+    """ Compare model serializers with `.values()` fast paths on `rows` watches and values.
+
+    Synthetic rows are created in a transaction which is rolled back afterwards.
+    """
+    results = []
+    with rolled_back():
+        user, watch = create_rows(rows)
+
+        results.append(measure('watch_list.serializer', lambda: WatchSerializer(user.watches.all(), many=True).data,
+                               repeat, rows=rows))
+        results.append(measure('watch_list.values', lambda: [watch_row_data(row) for row in
+                                                             user.watches.values(*WATCH_ROW_FIELDS)],
+                               repeat, rows=rows))
+        results.append(measure('value_list.serializer', lambda: ValueSerializer(watch.values.all(), many=True).data,
+                               repeat, rows=rows))
+        results.append(measure('value_list.values', lambda: [value_row_data(row) for row in
+                                                             watch.values.values(*VALUE_ROW_FIELDS)],
+                               repeat, rows=rows))
+    return results
+
+
+def bench_scrapper(sizes=PAGE_SIZES, corpus: str = None, repeat: int = 3) -> list:
+    """ Time `Scrapper.get_value()`, parsing included, for every XPath of `SCRAPPER_XPATHS`.
+
+    Pages are synthetic pages of `sizes` bytes and HTML files of `corpus` directory, if given.
+    """
+    pages = [('synthetic', make_page(size)) for size in sizes]
+    if corpus is not None:
+        pages.extend(load_corpus(corpus))
+
+    results = []
+    for page, content in pages:
+        for xpath_name, xpath in SCRAPPER_XPATHS:
+            results.append(measure('scrapper.{}'.format(xpath_name), lambda: Scrapper(content, xpath).get_value(),
+                                   repeat, page=page, size=len(content.encode('utf-8'))))
+    return results
+
+
+def bench_endpoints(sizes=ENDPOINT_ROWS, repeat: int = 3) -> list:
+    """ Time GET requests of watch and value endpoints with `sizes` synthetic watches and values.
+
+    Cached responses are invalidated before every request, so views do their whole work each time.
+    """
+    results = []
+    for rows in sizes:
+        with rolled_back(), override_settings(ALLOWED_HOSTS=['testserver']):
+            user, watch = create_rows(rows)
+            client = APIClient()
+            client.force_authenticate(user)
+            urls = (
+                ('watch_list', reverse('watch-list')),
+                ('watch_value_list', reverse('watch-value-list', kwargs={'pk': watch.pk})),
+                ('watch_value_latest', reverse('watch-value-latest', kwargs={'pk': watch.pk})),
+            )
+            for name, url in urls:
+                results.append(measure('endpoint.{}'.format(name), _uncached_get(client, url, watch.pk), repeat,
+                                       rows=rows))
+    return results
+
+
+def _uncached_get(client, url: str, pk: int):
+    def get():
+        invalidate_watch(pk)
+        response = client.get(url)
+        if response.status_code != 200:
+            raise AssertionError("GET {} returned {}".format(url, response.status_code))
+    return get
+
+
+def bench_inserts(rows: int = 1000, repeat: int = 3) -> list:
+    """ Compare inserting `rows` values one by one with `Value.objects.create()` and in batches with the ingester. """
+    results = []
+    with rolled_back():
+        user = User.objects.create(username='benchmark_user')
+        Watch.objects.bulk_create(
+            Watch(name='watch{}'.format(i), url='http://example.com/{}'.format(i), xpath='//h1/text()',
+                  period=timedelta(hours=1), next_check=timezone.now(), owner=user)
+            for i in range(rows))
+        watches = list(user.watches.all())
+        # Every run stores different contents, so it adds values in both storage modes
+        runs = itertools.count()
+
+        def create():
+            run = next(runs)
+            for watch in watches:
+                Value.objects.create(watch=watch, content='value {}'.format(run))
+
+        def ingest():
+            run = next(runs)
+            ingester = ValueIngester(max_size=rows + 1, max_age=float('inf'))
+            for watch in watches:
+                ingester.add(watch, 'value {}'.format(run))
+            ingester.flush()
+
+        results.append(measure('insert.create', create, repeat, operations=rows, rows=rows))
+        results.append(measure('insert.ingester', ingest, repeat, operations=rows, rows=rows))
+    return results
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+VERSION_KEY = 'webmon:watch:{}:version'
+RESPONSE_KEY = 'webmon:watch:{}:response:{}:{}'
+CACHED_HEADERS = ('Link',)
+
+
+def get_watch_version(pk) -> str:
+    """ Return current cache version of a watch. All responses cached under older versions are stale. """
+    key = VERSION_KEY.format(pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def get_watch_versions(pks) -> dict:
+    """ Return current cache versions of many watches, by watch id. """
+    versions = cache.get_many([VERSION_KEY.format(pk) for pk in pks])
+    return {pk: versions.get(VERSION_KEY.format(pk)) or get_watch_version(pk) for pk in pks}
+
+
+def invalidate_watches(pks):
+    """ Make all cached responses of watches `pks` stale.
+
+    Inside a transaction the versions are dropped once more when it commits, otherwise a request
+    served meanwhile could cache data from before the commit under the new version.
+    """
+    keys = [VERSION_KEY.format(pk) for pk in pks]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_watch(pk):
+    invalidate_watches([pk])
+
+
+def cache_watch_response(view):
+    """ Cache successful GET responses of a view taking a watch `pk`.
+
+    Responses are cached per watch, user and full request path together with the watch version
+    they were made under, and served with an ETag (see `etag_response()`). Version and response
+    are looked up at once, so a hit is a single cache lookup, which is one query with the database
+    cache. Use it only for views which take more than that, e.g. paginated listings.
+    """
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, pk, *args, **kwargs)
+
+        version_key = VERSION_KEY.format(pk)
+        path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = RESPONSE_KEY.format(pk, request.user.pk, path_hash)
+        found = cache.get_many([version_key, key])
+        version = found.get(version_key) or get_watch_version(pk)
+        entry = found.get(key)
+        if entry is None or entry[0] != version:
+            response = view(request, pk, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK or not isinstance(response, Response):
+                return response
+            entry = (version,) + _get_entry(response)
+            cache.set(key, entry, getattr(settings, 'WEBMON_CACHE_TIMEOUT', 300))
+
+        _, data, headers = entry
+        return _respond(request, data, headers)
+
+    return wrapper
+
+
+def etag_response(view):
+    """ Serve successful GET responses of a view with an ETag, without caching them.
+
+    Requests with a matching `If-None-Match` get 304 without a body. Meant for views cheaper than
+    a cache lookup, like single rows.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method != 'GET' or response.status_code != status.HTTP_200_OK or \
+                not isinstance(response, Response):
+            return response
+        return _respond(request, *_get_entry(response))
+
+    return wrapper
+
+
+def _get_entry(response: Response) -> tuple:
+    """ Return data and headers, ETag included, to serve `response` again. """
+    body = json.dumps(response.data, cls=JSONEncoder).encode()
+    headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+    headers['ETag'] = '"{}"'.format(hashlib.md5(body).hexdigest())
+    return response.data, headers
+
+
+def _respond(request, data, headers: dict) -> Response:
+    if headers['ETag'] in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': headers['ETag']})
+    return Response(data, headers=headers)
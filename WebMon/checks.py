@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Caches which are not shared between processes
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """ Invalidations of `fetch_watches` and other web workers only reach a cache shared by all processes. """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error("Default cache '{}' is not shared between processes.".format(backend),
+                      hint="Use a database, memcached or redis cache, cached watch responses would go stale.",
+                      id='WebMon.E001')]
+    return []
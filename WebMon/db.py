@@ -0,0 +1,22 @@
+from django.db.models import Case, When, Value
+
+
+def bulk_update(objs, fields, batch_size: int = 500):
+    """ Save `fields` of model instances `objs` with one UPDATE per batch.
+
+    Stands in for `QuerySet.bulk_update()`, which is not available before Django 2.2.
+    Like it, no `save()` is called and no signals are sent.
+    """
+    objs = list(objs)
+    if not objs:
+        return
+    model = type(objs[0])
+    model_fields = [model._meta.get_field(name) for name in fields]
+
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        updates = {}
+        for field in model_fields:
+            whens = [When(pk=obj.pk, then=Value(getattr(obj, field.attname), output_field=field)) for obj in batch]
+            updates[field.attname] = Case(*whens, output_field=field)
+        model.objects.filter(pk__in=[obj.pk for obj in batch]).update(**updates)
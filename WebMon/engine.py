@@ -0,0 +1,140 @@
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fetcher import Fetcher, HostThrottled
+from .ingest import ValueIngester
+from .parsing import InlineParser, ExtractionError, clean_stream_values, get_stream_xpaths
+from .scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def check_due_watches(fetcher: Fetcher, scheduler: Scheduler = None, parser: InlineParser = None,
+                      clock=timezone.now) -> int:
+    """ Fetch every watch whose `next_check` has passed and store its value.
+
+    Due watches are drained in batches claimed by `scheduler`, pages are parsed by `parser`.
+    Every batch reads `clock` when it is claimed and again when it is rescheduled, so in a long
+    drain leases start at their claim and next checks count from when the batch was checked.
+    Returns number of checked watches.
+    """
+    scheduler = scheduler or Scheduler()
+    parser = parser or InlineParser()
+    ingester = ValueIngester(scheduler)
+    checked = 0
+
+    while True:
+        watches = scheduler.claim_due(clock())
+        if not watches:
+            ingester.flush()
+            return checked
+
+        retry_after, deferred = check_watches(fetcher, watches, ingester, parser)
+        ingester.reschedule(watches, clock(), retry_after, deferred)
+        checked += len(watches)
+
+
+def check_watches(fetcher: Fetcher, watches: list, ingester: ValueIngester, parser: InlineParser = None) -> tuple:
+    """ Fetch and scrap `watches`, passing results to `ingester`.
+
+    Every URL is fetched and parsed only once, no matter how many of the watches point at it.
+    Pages which did not change since the last check (304 response or same body hash) are not
+    parsed again and produce no new values.
+    Large pages whose watches all select positioned matches are scrapped while they download,
+    which stops as soon as the matches are found (see `Fetcher.fetch_all()`).
+
+    `failures` of watches are counted up when their page cannot be fetched and reset otherwise.
+    Watches whose request the fetcher held back with `HostThrottled` are not checked and keep
+    their `failures`.
+    Returns seconds to wait before checking a watch again by watch id, for watches whose host
+    asked for it with `Retry-After` or which were held back, and the set of held back watch ids.
+    """
+    parser = parser or InlineParser()
+    by_url = OrderedDict()
+    for watch in watches:
+        by_url.setdefault(watch.url, []).append(watch)
+
+    headers = {}
+    for url, url_watches in by_url.items():
+        # Validators are only usable when every watch has seen the same response
+        if len({(watch.etag, watch.last_modified) for watch in url_watches}) == 1:
+            headers[url] = url_watches[0].get_conditional_headers()
+
+    expressions, stream_xpaths = {}, {}
+    for url, url_watches in by_url.items():
+        expressions[url] = [(watch.extractor, watch.xpath) for watch in url_watches]
+        xpaths = get_stream_xpaths(expressions[url])
+        if xpaths:
+            stream_xpaths[url] = xpaths
+
+    results = fetcher.fetch_all(by_url.keys(), headers=headers, stream_xpaths=stream_xpaths,
+                                stream_threshold=get_stream_threshold())
+    checked = timezone.now()
+
+    jobs, retry_after, deferred = [], {}, set()
+    for result, url_watches in zip(results, by_url.values()):
+        for watch in url_watches:
+            if result.retry_after:
+                retry_after[watch.pk] = result.retry_after
+        if isinstance(result.error, HostThrottled):
+            deferred.update(watch.pk for watch in url_watches)
+            logger.info("Fetching %s deferred: %s", result.url, result.error)
+            continue
+
+        fetched = result.ok or result.not_modified
+        for watch in url_watches:
+            watch.failures = 0 if fetched else watch.failures + 1
+
+        if result.not_modified:
+            ingester.confirm(url_watches, checked)
+            continue
+        if not result.ok:
+            logger.warning("Fetching %s failed: %s", result.url, result.error or result.status)
+            continue
+
+        content_hash = result.get_hash()
+        unchanged = [watch for watch in url_watches if watch.content_hash == content_hash]
+        changed = [watch for watch in url_watches if watch.content_hash != content_hash]
+        ingester.confirm(unchanged, checked)
+        ingester.set_validators(unchanged, result.etag, result.last_modified, content_hash)
+        if not changed:
+            continue
+        found = None
+        if result.values is not None:
+            # Values were found while downloading, the page is not parsed again
+            found = dict(zip((watch.pk for watch in url_watches),
+                             clean_stream_values(expressions[result.url], result.values)))
+        jobs.append((result, content_hash, changed, found))
+
+    parsed = iter(parser.extract_all(get_parse_job(result, [(watch.extractor, watch.xpath) for watch in changed])
+                                     for result, _, changed, found in jobs if found is None))
+
+    for result, content_hash, changed, found in jobs:
+        values = next(parsed) if found is None else [found[watch.pk] for watch in changed]
+        scrapped = []
+        for watch, value in zip(changed, values):
+            if isinstance(value, ExtractionError):
+                logger.warning("Watch %s: cannot extract value from %s: %s", watch.pk, watch.url, value)
+                continue
+            ingester.add(watch, value, checked)
+            scrapped.append(watch)
+
+        # Watches which failed to scrap keep old validators, so they are retried next time
+        ingester.set_validators(scrapped, result.etag, result.last_modified, content_hash)
+
+    return retry_after, deferred
+
+
+def get_stream_threshold() -> int:
+    """ Return `WEBMON_STREAM_THRESHOLD` setting, size in bytes from which pages are parsed incrementally. """
+    return getattr(settings, 'WEBMON_STREAM_THRESHOLD', 1024 * 1024)
+
+
+def get_parse_job(result, expressions: list) -> tuple:
+    """ Return parser job for a fetched page. Pages over `WEBMON_STREAM_THRESHOLD` bytes are streamed. """
+    if len(result.body) > get_stream_threshold():
+        return result.body, expressions, result.encoding
+    return result.get_text(), expressions, None
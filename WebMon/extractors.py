@@ -0,0 +1,148 @@
+import json
+import re
+from functools import lru_cache
+
+from lxml import etree
+
+from .scrapper import compile_xpath
+
+try:
+    from cssselect import GenericTranslator, SelectorError
+except ImportError:  # pragma: no cover
+    GenericTranslator = None
+
+EXTRACTORS = {}
+
+
+def register(cls):
+    EXTRACTORS[cls.name] = cls()
+    return cls
+
+
+def get_extractor(name: str):
+    try:
+        return EXTRACTORS[name]
+    except KeyError:
+        raise ValueError("Unknown extractor '{}'".format(name))
+
+
+@register
+class XPathExtractor(object):
+    """ Evaluates XPath on the parsed HTML tree. """
+    name = 'xpath'
+    needs_tree = True
+
+    def validate(self, expression: str):
+        try:
+            compile_xpath(self.to_xpath(expression))
+        except etree.XPathError as e:
+            raise ValueError(str(e))
+
+    def to_xpath(self, expression: str) -> str:
+        """ Return XPath which is evaluated for `expression`. """
+        return expression
+
+    def clean(self, value: str) -> str:
+        return value
+
+
+@register
+class CSSExtractor(XPathExtractor):
+    """ Text of elements matched by a CSS selector, with whitespace collapsed. """
+    name = 'css'
+
+    def to_xpath(self, expression: str) -> str:
+        return _css_to_xpath(expression)
+
+    def clean(self, value: str) -> str:
+        return ' '.join(value.split())
+
+
+@lru_cache(maxsize=512)
+def _css_to_xpath(selector: str) -> str:
+    if GenericTranslator is None:
+        raise ValueError("CSS selectors need the cssselect package")
+    try:
+        # Grouped selectors translate to a union, text is taken from all of its branches
+        return '({})//text()'.format(GenericTranslator().css_to_xpath(selector))
+    except SelectorError as e:
+        raise ValueError(str(e))
+
+
+@register
+class RegexExtractor(object):
+    """ Matches of a regular expression in the raw page. Only the groups are used when there are any. """
+    name = 'regex'
+    needs_tree = False
+
+    def validate(self, expression: str):
+        _compile_regex(expression)
+
+    def prepare(self, text: str):
+        return text
+
+    def extract(self, text: str, expression: str) -> str:
+        matches = []
+        for match in _compile_regex(expression).finditer(text):
+            matches.extend(match.groups() or [match.group()])
+        return ' '.join(match for match in matches if match is not None)
+
+
+@lru_cache(maxsize=512)
+def _compile_regex(expression: str):
+    try:
+        return re.compile(expression)
+    except re.error as e:
+        raise ValueError(str(e))
+
+
+JSON_PATH_STEP = re.compile(r'\.(?P<key>[^.\[\]*]+)|\[(?P<quote>[\'"])(?P<quoted>.*?)(?P=quote)\]|'
+                            r'\[(?P<index>-?\d+)\]|(?P<wildcard>\.\*|\[\*\])')
+
+
+@register
+class JSONPathExtractor(object):
+    """ Values selected from a JSON document by a JSONPath subset.
+
+    Supported are `$`, `.key`, `['key']`, `[index]` and `*` wildcards, e.g. `$.items[*].price`.
+    """
+    name = 'json'
+    needs_tree = False
+
+    def validate(self, expression: str):
+        _compile_json_path(expression)
+
+    def prepare(self, text: str):
+        return json.loads(text)
+
+    def extract(self, document, expression: str) -> str:
+        nodes = [document]
+        for kind, arg in _compile_json_path(expression):
+            selected = []
+            for node in nodes:
+                if kind == 'wildcard':
+                    selected.extend(node.values() if isinstance(node, dict) else node if isinstance(node, list) else [])
+                elif kind == 'key' and isinstance(node, dict) and arg in node:
+                    selected.append(node[arg])
+                elif kind == 'index' and isinstance(node, list) and -len(node) <= arg < len(node):
+                    selected.append(node[arg])
+            nodes = selected
+        return ' '.join(node if isinstance(node, str) else json.dumps(node) for node in nodes)
+
+
+@lru_cache(maxsize=512)
+def _compile_json_path(expression: str) -> tuple:
+    path = expression[1:] if expression.startswith('$') else '.' + expression
+    steps, position = [], 0
+    while position < len(path):
+        match = JSON_PATH_STEP.match(path, position)
+        if match is None:
+            raise ValueError("Invalid JSON path at '{}'".format(path[position:]))
+        if match.group('wildcard'):
+            steps.append(('wildcard', None))
+        elif match.group('index') is not None:
+            steps.append(('index', int(match.group('index'))))
+        else:
+            steps.append(('key', match.group('key') if match.group('key') is not None else match.group('quoted')))
+        position = match.end()
+    return tuple(steps)
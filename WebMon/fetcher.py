@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import aiohttp
+from django.utils import timezone
+from lxml import etree
+
+from .scrapper import ContentTooLarge, StreamScrapper, STREAM_CHUNK_SIZE, STREAM_MAX_SIZE
+
+# Responses telling us to slow down, honoured together with their `Retry-After` header
+THROTTLE_STATUSES = (429, 503)
+
+
+class HostThrottled(Exception):
+    """ Request was not sent because its host asked us to wait. """
+
+
+def parse_retry_after(value: str) -> float:
+    """ Return seconds to wait from a `Retry-After` header value, either seconds or HTTP date. None if invalid. """
+    value = (value or "").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None or timezone.is_naive(retry_at):
+        return None
+    return max(0.0, (retry_at - timezone.now()).total_seconds())
+
+
+class FetchResult(object):
+    def __init__(self, url: str, status: int = None, body: bytes = None, encoding: str = None,
+                 headers: dict = None, error: Exception = None, retry_after: float = None, values: list = None):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.encoding = encoding
+        self.headers = headers or {}
+        self.error = error
+        # Seconds the host asked us to wait before the next request, if it did
+        self.retry_after = retry_after
+        # Values of XPaths found while downloading, `body` then holds only the part read until then
+        self.values = values
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status == 200
+
+    @property
+    def not_modified(self) -> bool:
+        return self.error is None and self.status == 304
+
+    @property
+    def etag(self) -> str:
+        return self.headers.get('ETag', "")
+
+    @property
+    def last_modified(self) -> str:
+        return self.headers.get('Last-Modified', "")
+
+    def get_hash(self) -> str:
+        return hashlib.sha256(self.body).hexdigest()
+
+    def get_text(self) -> str:
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class Fetcher(object):
+    """ Fetches many URLs concurrently.
+
+    `concurrency` caps open connections in total, `per_host` caps them for
+    a single host. Connections are kept alive and reused for the duration
+    of one `fetch_all()` call. Bodies larger than `max_size` bytes are not
+    read and fail with `ContentTooLarge`.
+
+    Requests to a single host are started at no more than `host_rate` per
+    second on average, after a burst of `host_burst` requests (None disables
+    the limit). A request which would wait for its turn longer than `max_wait`
+    seconds (`timeout` by default) is not sent, so a batch with many URLs of
+    one host takes bounded time. A host answering 429 or 503 with `Retry-After`
+    gets no more requests until that time passes. Requests held back either
+    way fail with `HostThrottled`, with `retry_after` telling when to try again.
+    Both limits are remembered across `fetch_all()` calls of the same fetcher, until they lapse.
+    """
+
+    def __init__(self, concurrency: int = 20, per_host: int = 4, timeout: float = 30,
+                 max_size: int = STREAM_MAX_SIZE, host_rate: float = 1, host_burst: int = 4,
+                 max_wait: float = None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_size = max_size
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.max_wait = timeout if max_wait is None else max_wait
+        self._buckets = {}
+        self._blocked = {}
+
+    def fetch_all(self, urls, headers: dict = None, stream_xpaths: dict = None, stream_threshold: int = 0) -> list:
+        """ Fetch `urls` and return a `FetchResult` for each, in the same order.
+
+        `headers` maps URLs to extra request headers, e.g. conditional request validators.
+        `stream_xpaths` maps URLs to positioned XPaths (see `StreamScrapper`), which are evaluated
+        while pages of more than `stream_threshold` bytes download. Once all of them matched, the
+        response is closed: the rest of the page is neither downloaded nor kept in memory, and
+        the values are returned in `FetchResult.values`.
+        """
+        self._prune()
+        headers = headers or {}
+        stream_xpaths = stream_xpaths or {}
+        requests = [(url, headers.get(url), stream_xpaths.get(url)) for url in urls]
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._fetch_all(requests, stream_threshold))
+        finally:
+            loop.close()
+
+    async def _fetch_all(self, requests, stream_threshold):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await asyncio.gather(*[self._fetch(session, url, headers, xpaths, stream_threshold)
+                                          for url, headers, xpaths in requests])
+
+    async def _fetch(self, session, url, headers, xpaths=None, stream_threshold=0):
+        host = urlsplit(url).hostname
+        throttled = self._get_throttled(url, host)
+        if throttled is not None:
+            return throttled
+        if self.host_rate is not None:
+            bucket = self._buckets.setdefault(host, TokenBucket(self.host_rate, self.host_burst))
+            wait = bucket.get_wait()
+            if wait > self.max_wait:
+                message = "{} rate limit reached, deferred by {:.0f} s".format(host, wait)
+                return FetchResult(url, error=HostThrottled(message), retry_after=wait)
+            await asyncio.sleep(bucket.reserve())
+            # Host may have asked to wait while this request was waiting for its turn
+            throttled = self._get_throttled(url, host)
+            if throttled is not None:
+                return throttled
+
+        try:
+            result = await asyncio.wait_for(self._request(session, url, headers, xpaths, stream_threshold),
+                                            self.timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            return FetchResult(url, error=e)
+
+        if result.retry_after:
+            self._blocked[host] = max(self._blocked.get(host, 0), time.monotonic() + result.retry_after)
+        return result
+
+    def _prune(self):
+        """ Forget hosts whose bucket refilled and whose block expired, they would act the same anew. """
+        now = time.monotonic()
+        self._buckets = {host: bucket for host, bucket in self._buckets.items() if not bucket.is_full()}
+        self._blocked = {host: until for host, until in self._blocked.items() if until > now}
+
+    def _get_throttled(self, url, host):
+        """ Return failed result for `url` if its host asked us to wait, None otherwise. """
+        blocked = self._blocked.get(host, 0) - time.monotonic()
+        if blocked > 0:
+            return FetchResult(url, error=HostThrottled("{} asked to wait {:.0f} s".format(host, blocked)),
+                               retry_after=blocked)
+        return None
+
+    async def _request(self, session, url, headers, xpaths=None, stream_threshold=0):
+        async with session.get(url, headers=headers) as response:
+            if (response.content_length or 0) > self.max_size:
+                raise ContentTooLarge("Page is larger than {} bytes".format(self.max_size))
+            chunks, size, scrapper, values = [], 0, None, None
+            while True:
+                chunk = await response.content.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_size:
+                    raise ContentTooLarge("Page is larger than {} bytes".format(self.max_size))
+                chunks.append(chunk)
+
+                if scrapper is None and xpaths and response.status == 200 and size > stream_threshold:
+                    scrapper = StreamScrapper(xpaths, max_size=self.max_size, encoding=response.charset)
+                    chunk = b''.join(chunks)
+                if scrapper is not None:
+                    try:
+                        if scrapper.feed(chunk):
+                            values = scrapper.get_values()
+                            # Rest of the page cannot change the values
+                            response.close()
+                            break
+                    except (etree.ParserError, etree.XPathError, ValueError, TypeError):
+                        # Whole page is parsed again after download, which reports the error
+                        xpaths, scrapper = None, None
+
+            body = b''.join(chunks)
+            retry_after = None
+            if response.status in THROTTLE_STATUSES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            return FetchResult(url, status=response.status, body=body, encoding=response.charset,
+                               headers=response.headers.copy(), retry_after=retry_after, values=values)
+
+
+class TokenBucket(object):
+    """ Allows `rate` events per second on average, in bursts of up to `burst` events. """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def reserve(self) -> float:
+        """ Take a token and return how many seconds to wait before using it. """
+        self._refill()
+        # Tokens go negative for reservations waiting in line
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def get_wait(self) -> float:
+        """ Return how many seconds `reserve()` would wait now, without taking a token. """
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def is_full(self) -> bool:
+        """ Return whether the bucket holds `burst` tokens again, as if it was just created. """
+        self._refill()
+        return self.tokens >= self.burst
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
@@ -0,0 +1,100 @@
+import base64
+import zlib
+
+from django.conf import settings
+from django.db import models
+
+COMPRESSED_PREFIX = 'zlib:'
+
+
+def get_compress_threshold():
+    """ Return size in characters from which `CompressedTextField` content is stored compressed, None to disable. """
+    return getattr(settings, 'WEBMON_COMPRESS_THRESHOLD', None)
+
+
+def compress_text(text: str) -> str:
+    return COMPRESSED_PREFIX + base64.b64encode(zlib.compress(text.encode('utf-8'))).decode('ascii')
+
+
+def decompress_text(stored: str) -> str:
+    return zlib.decompress(base64.b64decode(stored[len(COMPRESSED_PREFIX):])).decode('utf-8')
+
+
+class CompressedText(object):
+    """ Compressed text loaded from the database, decompressed the first time it is turned into `str`. """
+
+    __slots__ = ('stored', '_text')
+
+    def __init__(self, stored: str):
+        self.stored = stored
+        self._text = None
+
+    def __str__(self):
+        if self._text is None:
+            self._text = decompress_text(self.stored)
+        return self._text
+
+    def __eq__(self, other):
+        if isinstance(other, (str, CompressedText)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return '<CompressedText: {} bytes stored>'.format(len(self.stored))
+
+
+class DecompressingAttribute(object):
+    """ Model attribute which turns `CompressedText` into `str` when it is read. """
+
+    def __init__(self, field, attribute):
+        self.field = field
+        # Original descriptor, loads the field when it was deferred
+        self.attribute = attribute
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = self.attribute.__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = instance.__dict__[self.field.attname] = str(value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """ Text field storing content of `WEBMON_COMPRESS_THRESHOLD` characters or more zlib compressed.
+
+    Compressed content is kept base64 encoded behind `COMPRESSED_PREFIX` in the same text column,
+    so rows written before compression was enabled are read as they are. Loaded content stays
+    compressed until it is read from the model attribute or converted with `str()`, which is what
+    `.values()` rows need before serialization.
+    """
+
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super(CompressedTextField, self).contribute_to_class(cls, name, *args, **kwargs)
+        setattr(cls, self.attname, DecompressingAttribute(self, cls.__dict__[self.attname]))
+
+    def from_db_value(self, value, expression, connection, *args):
+        if value is not None and value.startswith(COMPRESSED_PREFIX):
+            return CompressedText(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, CompressedText):
+            return str(value)
+        return super(CompressedTextField, self).to_python(value)
+
+    def get_db_prep_save(self, value, connection):
+        value = super(CompressedTextField, self).get_db_prep_save(value, connection)
+        if value is None:
+            return value
+        threshold = get_compress_threshold()
+        # Plain content looking like compressed one is compressed too, so reading it back is unambiguous
+        if (threshold is not None and len(value) >= threshold) or value.startswith(COMPRESSED_PREFIX):
+            return compress_text(value)
+        return value
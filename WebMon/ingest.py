@@ -0,0 +1,142 @@
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from .cache import invalidate_watches
+from .db import bulk_update
+from .models import Watch, Value
+from .notifications import enqueue_changes
+
+STORAGE_ALL = 'all'
+STORAGE_CHANGES = 'changes'
+
+
+def get_storage_mode() -> str:
+    """ Return `WEBMON_VALUE_STORAGE` setting.
+
+    With `all` every check adds a new Value. With `changes` a Value is only added when content differs
+    from the latest one, otherwise the latest Value gets its `last_seen` and `checks_count` bumped.
+    """
+    return getattr(settings, 'WEBMON_VALUE_STORAGE', STORAGE_ALL)
+
+
+class ValueIngester(object):
+    """ Buffers results of checks and writes them in batches.
+
+    Buffer is flushed when it holds `max_size` values or its oldest entry is `max_age` seconds old
+    (checked whenever something is added), and on explicit `flush()`. Every flush is one transaction:
+    values are inserted with `bulk_create()`, repeated contents only bump the latest value, and
+    `latest_value` pointers, conditional request validators and `next_check` of the checked watches
+    are updated together with them. Changed values of watches with `notify` are queued for
+    notification in the same transaction, sending them is left to `notifications.Dispatcher`.
+    """
+
+    def __init__(self, scheduler=None, max_size: int = 500, max_age: float = 5):
+        self.scheduler = scheduler
+        self.max_size = max_size
+        self.max_age = max_age
+        self._values = []
+        self._confirmed = []
+        self._validated = OrderedDict()
+        self._checked = []
+        self._started = None
+
+    def add(self, watch: Watch, content: str, checked=None):
+        """ Buffer `content` extracted from `watch` at `checked` time. """
+        self._values.append((watch, content, checked or timezone.now()))
+        self._touch()
+
+    def confirm(self, watches, checked=None):
+        """ Buffer checks of `watches` which found their page unchanged, so no value was extracted.
+
+        In `changes` storage mode their latest values get `last_seen` and `checks_count` bumped.
+        """
+        self._confirmed.append((list(watches), checked or timezone.now()))
+        self._touch()
+
+    def set_validators(self, watches, etag: str, last_modified: str, content_hash: str):
+        """ Buffer conditional request validators of the response `watches` were checked with. """
+        for watch in watches:
+            watch.etag = etag
+            watch.last_modified = last_modified
+            watch.content_hash = content_hash
+            self._validated[watch.pk] = watch
+        self._touch()
+
+    def reschedule(self, watches, now=None, retry_after: dict = None, deferred=()):
+        """ Buffer advancing `next_check` of checked `watches` with the scheduler, see `Scheduler.advance()`. """
+        self._checked.append((list(watches), now or timezone.now(), retry_after, deferred))
+        self._touch()
+
+    def flush(self):
+        if not (self._values or self._confirmed or self._validated or self._checked):
+            return
+        values, confirmed = self._values, self._confirmed
+        validated, checked = list(self._validated.values()), self._checked
+        self._values, self._confirmed, self._validated, self._checked = [], [], OrderedDict(), []
+        self._started = None
+
+        with transaction.atomic():
+            enqueue_changes(self._write_values(values))
+            self._write_confirmed(confirmed)
+            bulk_update(validated, Watch.VALIDATOR_FIELDS)
+            for watches, now, retry_after, deferred in checked:
+                self.scheduler.advance(watches, now, retry_after, deferred)
+
+        invalidate_watches({watch.pk for watch, _, _ in values} |
+                           {watch.pk for watches, _ in confirmed for watch in watches})
+
+    def _touch(self):
+        if self._started is None:
+            self._started = time.monotonic()
+        if len(self._values) >= self.max_size or time.monotonic() - self._started >= self.max_age:
+            self.flush()
+
+    @staticmethod
+    def _write_confirmed(confirmed):
+        if get_storage_mode() != STORAGE_CHANGES:
+            return
+        for watches, checked in confirmed:
+            Value.objects.filter(pk__in=[watch.latest_value_id for watch in watches
+                                         if watch.latest_value_id is not None]).update(
+                last_seen=checked, checks_count=F('checks_count') + 1)
+
+    @staticmethod
+    def _write_values(values) -> list:
+        """ Write `values`, return (watch, previous value) pairs of watches with `notify` whose content changed. """
+        if not values:
+            return []
+        storage_changes = get_storage_mode() == STORAGE_CHANGES
+        # Previous contents are needed to spot repeated contents, or changes to notify about
+        latest_values = Value.objects.in_bulk([watch.latest_value_id for watch, _, _ in values
+                                               if watch.latest_value_id is not None and
+                                               (storage_changes or watch.notify)])
+        latest = {value.watch_id: value for value in latest_values.values()}
+
+        created, seen, changed = [], {}, []
+        for watch, content, checked in values:
+            value = latest.get(watch.pk)
+            if storage_changes and value is not None and value.content == content:
+                value.last_seen = checked
+                value.checks_count += 1
+                seen[value.pk or id(value)] = value
+            else:
+                if watch.notify and value is not None and value.content != content:
+                    # Value written earlier in this batch has no id to refer to yet
+                    changed.append((watch, value if value.pk is not None else None))
+                value = Value(watch=watch, content=content, created=checked, last_seen=checked)
+                value.update_summary()
+                created.append(value)
+                latest[watch.pk] = value
+
+        # Seen values which are about to be inserted need no extra update
+        bulk_update([value for value in seen.values() if value.pk is not None], ['last_seen', 'checks_count'])
+        Value.objects.bulk_create(created, batch_size=500)
+
+        newest = Value.objects.filter(watch=OuterRef('pk')).order_by('-created', '-pk').values('pk')[:1]
+        Watch.objects.filter(pk__in={value.watch_id for value in created}).update(latest_value=Subquery(newest))
+        return changed
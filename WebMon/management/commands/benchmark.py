@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmarks import bench_serializers, bench_scrapper, bench_endpoints, bench_inserts, get_environment, \
+    PAGE_SIZES, ENDPOINT_ROWS
+
+SUITES = ('serializers', 'scrapper', 'endpoints', 'inserts')
+
+
+def int_list(value: str) -> list:
+    return [int(item) for item in value.split(',') if item]
+
+
+class Command(BaseCommand):
+    help = 'Run WebMon benchmarks on synthetic data. Nothing is left in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', metavar='SUITE',
+                            help='Benchmarks to run, some of: {}. All by default.'.format(', '.join(SUITES)))
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Number of synthetic rows of serializer benchmarks.')
+        parser.add_argument('--page-sizes', type=int_list, default=list(PAGE_SIZES),
+                            help='Comma separated sizes of synthetic pages for scrapper benchmarks, in bytes.')
+        parser.add_argument('--corpus', default=None,
+                            help='Directory of HTML files to add to scrapper benchmarks.')
+        parser.add_argument('--endpoint-rows', type=int_list, default=list(ENDPOINT_ROWS),
+                            help='Comma separated numbers of synthetic rows for endpoint benchmarks.')
+        parser.add_argument('--insert-rows', type=int, default=1000,
+                            help='Number of values inserted per run of insert benchmarks.')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print results with environment details as JSON, for comparing between releases.')
+
+    def handle(self, *args, **options):
+        suites = options['suites'] or SUITES
+        unknown = set(suites) - set(SUITES)
+        if unknown:
+            raise CommandError('Unknown benchmarks: {}.'.format(', '.join(sorted(unknown))))
+        repeat = options['repeat']
+        results = []
+        if 'serializers' in suites:
+            results.extend(bench_serializers(rows=options['rows'], repeat=repeat))
+        if 'scrapper' in suites:
+            results.extend(bench_scrapper(sizes=options['page_sizes'], corpus=options['corpus'], repeat=repeat))
+        if 'endpoints' in suites:
+            results.extend(bench_endpoints(sizes=options['endpoint_rows'], repeat=repeat))
+        if 'inserts' in suites:
+            results.extend(bench_inserts(rows=options['insert_rows'], repeat=repeat))
+
+        if options['json']:
+            self.stdout.write(json.dumps({'environment': get_environment(), 'results': results}, indent=2))
+            return
+        for result in results:
+            info = ', '.join('{}={}'.format(key, value) for key, value in result.items()
+                             if key not in ('name', 'seconds', 'per_second'))
+            self.stdout.write('{name}: {seconds:.4f}s ({info})'.format(info=info, **result))
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from ...notifications import Dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Send due change notifications of watches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Maximum number of notifications sent at once.')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Number of attempts to send a notification before giving up.')
+        parser.add_argument('--retry-delay', type=float, default=60,
+                            help='Delay before the first retry of a failed notification, in seconds. '
+                                 'Doubles with every further attempt.')
+        parser.add_argument('--timeout', type=float, default=10,
+                            help='Timeout of a single webhook request, in seconds.')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Maximum number of simultaneous webhook requests.')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running and look for due notifications every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher(batch_size=options['batch_size'], max_attempts=options['max_attempts'],
+                                retry_delay=timedelta(seconds=options['retry_delay']),
+                                timeout=options['timeout'], concurrency=options['concurrency'])
+        while True:
+            # Drain all due notifications before sleeping
+            while True:
+                result = dispatcher.dispatch()
+                if sum(result.values()):
+                    self.stdout.write('Sent {sent}, failed {failed}, dropped {dropped} notifications.'.format(**result))
+                if sum(result.values()) < options['batch_size']:
+                    break
+
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,69 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from ...engine import check_due_watches
+from ...fetcher import Fetcher
+from ...parsing import InlineParser, ParsePool
+from ...scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = 'Fetch all due watches and store their values.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20,
+                            help='Maximum number of simultaneous connections.')
+        parser.add_argument('--per-host', type=int, default=4,
+                            help='Maximum number of simultaneous connections to a single host.')
+        parser.add_argument('--timeout', type=float, default=30,
+                            help='Timeout of a single fetch, in seconds.')
+        parser.add_argument('--host-rate', type=float, default=1,
+                            help='Average number of requests started per second to a single host.')
+        parser.add_argument('--host-burst', type=int, default=4,
+                            help='Number of requests to a single host allowed at once before --host-rate applies.')
+        parser.add_argument('--max-wait', type=float, default=None,
+                            help='Longest time a request waits for --host-rate, in seconds, before it is deferred '
+                                 'to a later check. Defaults to --timeout.')
+        parser.add_argument('--max-body-size', type=int, default=10 * 1024 * 1024,
+                            help='Pages larger than this many bytes are not read.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of due watches claimed at once.')
+        parser.add_argument('--worker', default=None,
+                            help='Name under which watches are leased. Defaults to host name and PID.')
+        parser.add_argument('--lease', type=float, default=300,
+                            help='How long claimed watches stay leased to this worker, in seconds.')
+        parser.add_argument('--parse-workers', type=int, default=None,
+                            help='Number of parser processes. Defaults to number of CPUs, 0 parses in this process.')
+        parser.add_argument('--parse-chunk-size', type=int, default=4,
+                            help='Number of pages sent to a parser process at once.')
+        parser.add_argument('--max-backoff', type=float, default=24 * 60 * 60,
+                            help='Longest time failing watches are backed off to, in seconds.')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running and look for due watches every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        fetcher = Fetcher(concurrency=options['concurrency'], per_host=options['per_host'],
+                          timeout=options['timeout'], max_size=options['max_body_size'],
+                          host_rate=options['host_rate'], host_burst=options['host_burst'],
+                          max_wait=options['max_wait'])
+        scheduler = Scheduler(batch_size=options['batch_size'], worker=options['worker'],
+                              lease=timedelta(seconds=options['lease']),
+                              max_backoff=timedelta(seconds=options['max_backoff']))
+
+        if options['parse_workers'] == 0:
+            page_parser = InlineParser()
+        else:
+            page_parser = ParsePool(workers=options['parse_workers'], chunk_size=options['parse_chunk_size'])
+
+        try:
+            while True:
+                checked = check_due_watches(fetcher, scheduler, page_parser)
+                self.stdout.write('Checked {} watches.'.format(checked))
+
+                if options['interval'] is None:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            page_parser.close()
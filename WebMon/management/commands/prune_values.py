@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...retention import RetentionPolicy
+
+
+class Command(BaseCommand):
+    help = 'Downsample and delete old values according to WEBMON_VALUE_RETENTION.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Maximum number of values deleted at once.')
+
+    def handle(self, *args, **options):
+        deleted = RetentionPolicy.from_settings().prune(batch_size=options['batch_size'])
+        self.stdout.write('Deleted {} values ({} downsampled, {} expired).'.format(
+            deleted['downsampled'] + deleted['expired'], deleted['downsampled'], deleted['expired']))
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0002_value'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='watch',
+            name='next_check',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+    ]
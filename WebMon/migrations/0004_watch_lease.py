@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0003_watch_next_check_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watch',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='watch',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_last_seen(apps, schema_editor):
+    Value = apps.get_model('WebMon', 'Value')
+    Value.objects.update(last_seen=models.F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0005_watch_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='value',
+            name='last_seen',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='value',
+            name='checks_count',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(set_last_seen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_latest_value(apps, schema_editor):
+    Watch = apps.get_model('WebMon', 'Watch')
+    Value = apps.get_model('WebMon', 'Value')
+    latest = Value.objects.filter(watch=models.OuterRef('pk')).order_by('-created', '-pk').values('pk')[:1]
+    Watch.objects.update(latest_value=models.Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0006_value_last_seen'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='value',
+            index=models.Index(fields=['watch', 'created'], name='WebMon_valu_watch_i_377a5f_idx'),
+        ),
+        migrations.AddField(
+            model_name='watch',
+            name='latest_value',
+            field=models.ForeignKey(blank=True, editable=False, null=True,
+                                    on_delete=django.db.models.deletion.SET_NULL, related_name='+',
+                                    to='WebMon.Value'),
+        ),
+        migrations.RunPython(set_latest_value, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0007_value_latest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watch',
+            name='extractor',
+            field=models.CharField(choices=[('xpath', 'XPath'), ('css', 'CSS selector'),
+                                            ('regex', 'Regular expression'), ('json', 'JSON path')],
+                                   default='xpath', max_length=10),
+        ),
+    ]
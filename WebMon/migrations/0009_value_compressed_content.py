@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+import WebMon.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0008_watch_extractor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='value',
+            name='content',
+            field=WebMon.fields.CompressedTextField(default=''),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def set_summary(apps, schema_editor):
+    Value = apps.get_model('WebMon', 'Value')
+    for value in Value.objects.only('pk', 'content').iterator():
+        content = str(value.content)
+        Value.objects.filter(pk=value.pk).update(
+            length=len(content), digest=hashlib.sha256(content.encode('utf-8')).hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0009_value_compressed_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='value',
+            name='length',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='value',
+            name='digest',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(set_summary, migrations.RunPython.noop),
+    ]
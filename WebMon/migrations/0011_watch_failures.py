@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0010_value_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watch',
+            name='failures',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
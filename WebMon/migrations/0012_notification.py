@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebMon', '0011_watch_failures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watch',
+            name='webhook_url',
+            field=models.URLField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('webhook', 'Webhook'), ('email', 'Email')], max_length=10)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')],
+                                           default='pending', max_length=10)),
+                ('created', models.DateTimeField()),
+                ('due', models.DateTimeField()),
+                ('sent', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('previous', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                               related_name='+', to='WebMon.Value')),
+                ('watch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                            related_name='notifications', to='WebMon.Watch')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['state', 'due'], name='WebMon_noti_state_02f353_idx'),
+        ),
+    ]
@@ -1,30 +1,152 @@
+import hashlib
+
 from django.db import models
 from django.utils import timezone
 
+from .fields import CompressedTextField
+
 
 class Watch(models.Model):
+    EXTRACTOR_CHOICES = (
+        ('xpath', 'XPath'),
+        ('css', 'CSS selector'),
+        ('regex', 'Regular expression'),
+        ('json', 'JSON path'),
+    )
+
     name = models.CharField(max_length=50)
     url = models.URLField()
+    # Expression evaluated by the extractor, named after the original XPath-only extraction
     xpath = models.CharField(max_length=200)
+    extractor = models.CharField(max_length=10, choices=EXTRACTOR_CHOICES, default='xpath')
     period = models.DurationField()
-    next_check = models.DateTimeField(null=True)
+    next_check = models.DateTimeField(null=True, db_index=True)
     notify = models.BooleanField(default=False, blank=True)
+    # Changes are POSTed here when `notify` is set, besides being emailed to the owner
+    webhook_url = models.URLField(default="", blank=True)
     owner = models.ForeignKey('auth.User', related_name='watches', on_delete=models.CASCADE)
-    
+    lease_owner = models.CharField(max_length=100, default="", blank=True)
+    lease_expires = models.DateTimeField(null=True, blank=True)
+    etag = models.CharField(max_length=200, default="", blank=True)
+    last_modified = models.CharField(max_length=50, default="", blank=True)
+    content_hash = models.CharField(max_length=64, default="", blank=True)
+    # Number of checks in a row which failed to fetch the page, backs the next check off
+    failures = models.PositiveIntegerField(default=0, editable=False)
+    # Denormalized pointer to the newest Value, kept up to date by Value.save()
+    latest_value = models.ForeignKey('Value', related_name='+', null=True, blank=True, editable=False,
+                                     on_delete=models.SET_NULL)
+
+    VALIDATOR_FIELDS = ('etag', 'last_modified', 'content_hash')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Watch, cls).from_db(db, field_names, values)
+        # Remember what the validators were collected for, see save()
+        if not {'url', 'xpath', 'extractor'} & instance.get_deferred_fields():
+            instance._loaded_source = instance.get_source()
+        return instance
+
     def save(self, *args, **kwargs):
         # Set next_check only when object is created
         if self.pk is None:
             self.next_check = timezone.now() + self.period
+        # Validators of a different URL or expression must not suppress the next check
+        elif self.source_changed():
+            self.reset_validators()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | set(self.VALIDATOR_FIELDS)
         super(Watch, self).save(*args, **kwargs)
+        self._loaded_source = self.get_source()
+
+    def get_source(self) -> tuple:
+        """ Return what the value is extracted from and how. """
+        return self.url, self.extractor, self.xpath
+
+    def source_changed(self) -> bool:
+        return getattr(self, '_loaded_source', self.get_source()) != self.get_source()
+
+    def reset_validators(self):
+        self.etag = ""
+        self.last_modified = ""
+        self.content_hash = ""
+
+    def get_conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
 
 
 class Value(models.Model):
     watch = models.ForeignKey(Watch, related_name='values', on_delete=models.CASCADE)
     created = models.DateTimeField(editable=False)
-    content = models.TextField(default="")
+    content = CompressedTextField(default="")
+    # Time of the latest check which still returned this content
+    last_seen = models.DateTimeField(null=True, editable=False)
+    checks_count = models.PositiveIntegerField(default=1, editable=False)
+    # Summary of content for listings which skip the content column
+    length = models.PositiveIntegerField(default=0, editable=False)
+    digest = models.CharField(max_length=64, default="", blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['watch', 'created'], name='WebMon_valu_watch_i_377a5f_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        """ On save, update timestamp. """
-        if not self.id:
+        """ On save, update timestamp and summary and point the watch at the new value. """
+        created = not self.id
+        if created:
             self.created = timezone.now()
-        return super(Value, self).save(*args, **kwargs)
+            self.last_seen = self.created
+            self.update_summary()
+        result = super(Value, self).save(*args, **kwargs)
+        if created:
+            Watch.objects.filter(pk=self.watch_id).update(latest_value=self)
+        return result
+
+    def update_summary(self):
+        """ Set `length` and `digest` from `content`. Call it before `bulk_create()`, which skips `save()`. """
+        content = self.content
+        self.length = len(content)
+        self.digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class Notification(models.Model):
+    """ Queued message about a changed value of a watch, sent by `WebMon.notifications.Dispatcher`.
+
+    Tells about the change from `previous` to the latest value of the watch at the time it is sent,
+    so changes made while it waits are folded into it.
+    """
+    WEBHOOK = 'webhook'
+    EMAIL = 'email'
+    CHANNEL_CHOICES = (
+        (WEBHOOK, 'Webhook'),
+        (EMAIL, 'Email'),
+    )
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATE_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    watch = models.ForeignKey(Watch, related_name='notifications', on_delete=models.CASCADE)
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    previous = models.ForeignKey(Value, related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=PENDING)
+    created = models.DateTimeField()
+    # Not sent before this time, then retried after failures
+    due = models.DateTimeField()
+    sent = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(default="", blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'due'], name='WebMon_noti_state_02f353_idx'),
+        ]
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import smtplib
+from collections import OrderedDict
+from datetime import timedelta
+
+import aiohttp
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .db import bulk_update
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def get_notify_window() -> timedelta:
+    """ Return `WEBMON_NOTIFY_WINDOW` setting, how long a notification waits for further changes to fold in. """
+    return getattr(settings, 'WEBMON_NOTIFY_WINDOW', timedelta(minutes=5))
+
+
+def enqueue_changes(changes, now=None):
+    """ Queue notifications about changes, given as (watch, previous value) pairs, of watches with `notify`.
+
+    Webhooks go to `webhook_url` of the watch, emails to its owner, if they are set. A watch which
+    already has a notification pending on a channel gets no new one there: the pending one reports
+    the latest value once it is sent, which coalesces bursts of changes into one message.
+    """
+    changes = [(watch, previous) for watch, previous in changes if watch.notify]
+    if not changes:
+        return
+    now = now or timezone.now()
+    emails = dict(User.objects.filter(pk__in={watch.owner_id for watch, _ in changes}).values_list('pk', 'email'))
+    pending = set(Notification.objects.filter(watch__in={watch.pk for watch, _ in changes}, state=Notification.PENDING)
+                  .values_list('watch_id', 'channel'))
+
+    notifications = []
+    for watch, previous in changes:
+        channels = []
+        if watch.webhook_url:
+            channels.append(Notification.WEBHOOK)
+        if emails.get(watch.owner_id):
+            channels.append(Notification.EMAIL)
+        for channel in channels:
+            if (watch.pk, channel) in pending:
+                continue
+            pending.add((watch.pk, channel))
+            notifications.append(Notification(watch=watch, channel=channel, previous=previous, created=now,
+                                              due=now + get_notify_window()))
+    Notification.objects.bulk_create(notifications)
+
+
+def get_payload(notification: Notification) -> dict:
+    watch = notification.watch
+    value = watch.latest_value
+    return OrderedDict((
+        ('watch', watch.pk),
+        ('name', watch.name),
+        ('url', watch.url),
+        ('previous', notification.previous.content if notification.previous is not None else None),
+        ('current', value.content),
+        ('changed', value.created),
+    ))
+
+
+class Dispatcher(object):
+    """ Sends due notifications in batches, away from fetching and ingestion.
+
+    Up to `batch_size` notifications are sent per `dispatch()`. Webhooks are POSTed concurrently,
+    at most `concurrency` at once, each within `timeout` seconds; emails go through one connection
+    of the configured email backend. A failed notification is retried after `retry_delay`, doubled
+    with every further attempt, and is given up after `max_attempts`. Notifications whose watch
+    went back to the previous content before they were sent are dropped.
+
+    Only one dispatcher should run at a time.
+    """
+
+    def __init__(self, batch_size: int = 100, max_attempts: int = 5, retry_delay: timedelta = timedelta(minutes=1),
+                 timeout: float = 10, concurrency: int = 10):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+    def dispatch(self, now=None) -> dict:
+        """ Send one batch of due notifications. Returns numbers of them which were sent, failed and dropped. """
+        now = now or timezone.now()
+        notifications = list(Notification.objects
+                             .filter(state=Notification.PENDING, due__lte=now)
+                             .select_related('watch__latest_value', 'watch__owner', 'previous')
+                             .order_by('due')[:self.batch_size])
+
+        dropped, send = [], []
+        for notification in notifications:
+            latest = notification.watch.latest_value
+            previous = notification.previous
+            if latest is None or (previous is not None and previous.content == latest.content):
+                dropped.append(notification.pk)
+            else:
+                send.append(notification)
+
+        errors = self._send_webhooks([n for n in send if n.channel == Notification.WEBHOOK])
+        errors.update(self._send_emails([n for n in send if n.channel == Notification.EMAIL]))
+
+        for notification in send:
+            notification.attempts += 1
+            if notification.pk not in errors:
+                notification.state = Notification.SENT
+                notification.sent = now
+                notification.error = ""
+                continue
+            notification.error = errors[notification.pk]
+            logger.warning("Notification %s of watch %s failed: %s", notification.pk, notification.watch_id,
+                           notification.error)
+            if notification.attempts >= self.max_attempts:
+                notification.state = Notification.FAILED
+            else:
+                notification.due = now + self.retry_delay * 2 ** (notification.attempts - 1)
+
+        bulk_update(send, ['state', 'sent', 'due', 'attempts', 'error'])
+        Notification.objects.filter(pk__in=dropped).delete()
+        return {'sent': len(send) - len(errors), 'failed': len(errors), 'dropped': len(dropped)}
+
+    def _send_emails(self, notifications) -> dict:
+        """ Send `notifications` by email, return errors by notification id. """
+        errors = {}
+        if not notifications:
+            return errors
+        connection = get_connection()
+        try:
+            connection.open()
+        except (smtplib.SMTPException, OSError) as e:
+            return {notification.pk: str(e) for notification in notifications}
+        try:
+            for notification in notifications:
+                try:
+                    connection.send_messages([self._get_email(notification, connection)])
+                except (smtplib.SMTPException, OSError) as e:
+                    errors[notification.pk] = str(e)
+        finally:
+            connection.close()
+        return errors
+
+    @staticmethod
+    def _get_email(notification: Notification, connection) -> EmailMessage:
+        payload = get_payload(notification)
+        body = "{url}\n\nPrevious value:\n{previous}\n\nCurrent value:\n{current}\n".format(**payload)
+        return EmailMessage("WebMon: {} changed".format(payload['name']), body,
+                            to=[notification.watch.owner.email], connection=connection)
+
+    def _send_webhooks(self, notifications) -> dict:
+        """ POST `notifications` to their webhooks, return errors by notification id. """
+        if not notifications:
+            return {}
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._post_all(notifications))
+        finally:
+            loop.close()
+
+    async def _post_all(self, notifications):
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            results = await asyncio.gather(*[self._post(session, notification) for notification in notifications])
+        return {notification.pk: error for notification, error in zip(notifications, results) if error is not None}
+
+    async def _post(self, session, notification):
+        data = json.dumps(get_payload(notification), cls=JSONEncoder)
+        try:
+            return await asyncio.wait_for(self._request(session, notification.watch.webhook_url, data), self.timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            return str(e) or type(e).__name__
+
+    @staticmethod
+    async def _request(session, url, data):
+        async with session.post(url, data=data, headers={'Content-Type': 'application/json'}) as response:
+            if response.status >= 300:
+                return "HTTP {}".format(response.status)
+            return None
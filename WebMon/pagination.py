@@ -0,0 +1,83 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+
+def parse_time(value: str, name: str):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: ['Enter a valid date/time.']})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def encode_cursor(created, pk) -> str:
+    position = '{}|{}'.format(created.isoformat(), pk)
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return parse_time(created, 'cursor'), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValidationError({'cursor': ['Invalid cursor.']})
+
+
+class ValuePagination(object):
+    """ Keyset pagination of values ordered by (`created`, `id`).
+
+    Query parameters:
+        `limit` - page size, at most `max_limit`
+        `since`, `until` - only values created in that (inclusive) time range
+        `cursor` - position returned in `Link: <...>; rel="next"` header of the previous page
+    """
+    default_limit = 100
+    max_limit = 1000
+
+    def __init__(self, request):
+        self.request = request
+        self.limit = self._get_limit()
+        self.next_cursor = None
+
+    def paginate(self, queryset) -> list:
+        """ Return the requested page of `queryset`, either of model instances or of `.values()` rows. """
+        params = self.request.query_params
+        if 'since' in params:
+            queryset = queryset.filter(created__gte=parse_time(params['since'], 'since'))
+        if 'until' in params:
+            queryset = queryset.filter(created__lte=parse_time(params['until'], 'until'))
+        if 'cursor' in params:
+            created, pk = decode_cursor(params['cursor'])
+            queryset = queryset.filter(Q(created__gt=created) | Q(created=created, pk__gt=pk))
+
+        page = list(queryset.order_by('created', 'pk')[:self.limit + 1])
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            last = page[-1]
+            if isinstance(last, dict):
+                self.next_cursor = encode_cursor(last['created'], last['id'])
+            else:
+                self.next_cursor = encode_cursor(last.created, last.pk)
+        return page
+
+    def get_headers(self) -> dict:
+        if self.next_cursor is None:
+            return {}
+        url = replace_query_param(self.request.build_absolute_uri(), 'cursor', self.next_cursor)
+        return {'Link': '<{}>; rel="next"'.format(url)}
+
+    def _get_limit(self) -> int:
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        if limit < 1:
+            raise ValidationError({'limit': ['Ensure this value is greater than or equal to 1.']})
+        return min(limit, self.max_limit)
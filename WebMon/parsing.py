@@ -0,0 +1,147 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lxml import etree
+
+from .extractors import get_extractor
+from .scrapper import FIRST_MATCHES_XPATH, Scrapper, iter_chunks, stream_values
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def extract_values(content, expressions: list, encoding: str = None) -> list:
+    """ Extract a value for each expression from `content`, or an `ExtractionError` where it fails.
+
+    Expressions are `(extractor, expression)` pairs or plain XPaths. HTML is only parsed when some
+    extractor needs the tree, `content` given as `bytes` (in `encoding`, if known) is parsed in
+    streaming mode.
+    """
+    expressions = [(expression if isinstance(expression, tuple) else ('xpath', expression))
+                   for expression in expressions]
+    values = [None] * len(expressions)
+    tree_expressions = []
+    documents = {}
+
+    for i, (name, expression) in enumerate(expressions):
+        try:
+            extractor = get_extractor(name)
+            extractor.validate(expression)
+            if extractor.needs_tree:
+                tree_expressions.append((i, extractor, extractor.to_xpath(expression)))
+                continue
+            if name not in documents:
+                text = content.decode(encoding or 'utf-8', errors='replace') if isinstance(content, bytes) else content
+                documents[name] = extractor.prepare(text)
+            values[i] = extractor.extract(documents[name], expression)
+        except ValueError as e:
+            values[i] = ExtractionError(str(e))
+
+    if tree_expressions:
+        xpaths = [xpath for _, _, xpath in tree_expressions]
+        if isinstance(content, bytes):
+            try:
+                tree_values = stream_values(iter_chunks(content), xpaths, encoding=encoding)
+            except (etree.ParserError, etree.XPathError, ValueError, TypeError) as e:
+                tree_values = [ExtractionError(str(e))] * len(xpaths)
+        else:
+            tree_values = _extract_xpaths(content, xpaths)
+        for (i, extractor, _), value in zip(tree_expressions, tree_values):
+            values[i] = value if isinstance(value, ExtractionError) else extractor.clean(value)
+
+    return values
+
+
+def get_stream_xpaths(expressions: list) -> list:
+    """ Return XPaths of `(extractor, expression)` pairs if all their values can be found in the start
+    of a page, i.e. all are positioned XPaths (see `StreamScrapper`), None otherwise.
+    """
+    xpaths = []
+    for name, expression in expressions:
+        try:
+            extractor = get_extractor(name)
+            extractor.validate(expression)
+        except ValueError:
+            return None
+        if not extractor.needs_tree:
+            return None
+        xpath = extractor.to_xpath(expression)
+        if not FIRST_MATCHES_XPATH.match(xpath):
+            return None
+        xpaths.append(xpath)
+    return xpaths
+
+
+def clean_stream_values(expressions: list, values: list) -> list:
+    """ Finish values found for `get_stream_xpaths()` of `expressions` the way `extract_values()` does. """
+    return [get_extractor(name).clean(value) for (name, _), value in zip(expressions, values)]
+
+
+def _extract_xpaths(content: str, xpaths: list) -> list:
+    scrapper = Scrapper(content=content)
+    values = []
+    for xpath in xpaths:
+        scrapper.set_xpath(xpath)
+        try:
+            values.append(scrapper.get_value())
+        except (etree.ParserError, etree.XPathError, ValueError, TypeError) as e:
+            values.append(ExtractionError(str(e)))
+    return values
+
+
+class InlineParser(object):
+    """ Extracts values in the calling process. """
+
+    def extract_all(self, jobs) -> list:
+        """ Run `extract_values()` for each `(content, expressions[, encoding])` job. """
+        return [extract_values(*job) for job in jobs]
+
+    def close(self):
+        pass
+
+
+class ParsePool(InlineParser):
+    """ Extracts values in a pool of worker processes, so parsing is not limited by the GIL.
+
+    Jobs are sent to the workers in chunks of `chunk_size`. When a worker dies, the pool is
+    restarted and the jobs are retried one by one; a job which breaks the pool again fails
+    with `ExtractionError` for all its XPaths.
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = 4):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def extract_all(self, jobs) -> list:
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        try:
+            return list(self._get_executor().map(extract_values, *zip(*jobs), chunksize=self.chunk_size))
+        except BrokenProcessPool:
+            logger.warning("Parser process crashed, retrying %s jobs one by one", len(jobs))
+            self.close()
+        return [self._extract_one(*job) for job in jobs]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _extract_one(self, content, expressions: list, *args) -> list:
+        try:
+            return self._get_executor().submit(extract_values, content, expressions, *args).result()
+        except BrokenProcessPool:
+            self.close()
+            return [ExtractionError("Parser process crashed")] * len(expressions)
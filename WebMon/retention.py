@@ -0,0 +1,82 @@
+from datetime import timedelta, datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import invalidate_watches
+from .models import Watch, Value
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class RetentionPolicy(object):
+    """ How much value history is kept, by age.
+
+    `tiers` is a list of `(max_age, resolution)` pairs sorted by age. Values up to `max_age` old
+    are kept at `resolution`, i.e. only the newest value of each `resolution` long interval.
+    Resolution `None` keeps every value. Values older than the last tier are deleted, unless its
+    `max_age` is `None`. The latest value of a watch is never deleted.
+    """
+
+    def __init__(self, tiers):
+        self.tiers = list(tiers)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(getattr(settings, 'WEBMON_VALUE_RETENTION', [(None, None)]))
+
+    def prune(self, now=None, batch_size: int = 1000) -> dict:
+        """ Delete values outside the policy in batches of at most `batch_size`. Returns deleted counts. """
+        now = now or timezone.now()
+        latest = set(Watch.objects.exclude(latest_value=None).values_list('latest_value_id', flat=True))
+        deleted = {'downsampled': 0, 'expired': 0}
+
+        newer_than = now
+        for max_age, resolution in self.tiers:
+            older_than = now - max_age if max_age is not None else None
+            if resolution is not None:
+                deleted['downsampled'] += self._downsample(older_than, newer_than, resolution, latest, batch_size)
+            if older_than is None:
+                return deleted
+            newer_than = older_than
+
+        deleted['expired'] += self._expire(newer_than, batch_size)
+        return deleted
+
+    def _downsample(self, older_than, newer_than, resolution: timedelta, latest: set, batch_size: int) -> int:
+        values = Value.objects.filter(created__lt=newer_than)
+        if older_than is not None:
+            values = values.filter(created__gte=older_than)
+
+        deleted = 0
+        for watch_id in list(values.order_by().values_list('watch_id', flat=True).distinct()):
+            rows = values.filter(watch_id=watch_id).order_by('-created', '-pk').values_list('pk', 'created')
+            seen_buckets = set()
+            doomed = []
+            for pk, created in rows:
+                bucket = (created - EPOCH) // resolution
+                if bucket in seen_buckets and pk not in latest:
+                    doomed.append(pk)
+                seen_buckets.add(bucket)
+            deleted += self._delete(doomed, batch_size)
+        return deleted
+
+    def _expire(self, older_than, batch_size: int) -> int:
+        latest = Watch.objects.exclude(latest_value=None).values('latest_value_id')
+        deleted = 0
+        while True:
+            doomed = list(Value.objects.filter(created__lt=older_than).exclude(pk__in=latest)
+                          .values_list('pk', flat=True)[:batch_size])
+            if not doomed:
+                return deleted
+            deleted += self._delete(doomed, batch_size)
+
+    @staticmethod
+    def _delete(pks: list, batch_size: int) -> int:
+        deleted = 0
+        for start in range(0, len(pks), batch_size):
+            batch = Value.objects.filter(pk__in=pks[start:start + batch_size])
+            watch_ids = set(batch.values_list('watch_id', flat=True))
+            deleted += batch.delete()[1].get(Value._meta.label, 0)
+            invalidate_watches(watch_ids)
+        return deleted
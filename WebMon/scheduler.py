@@ -0,0 +1,114 @@
+import os
+import random
+import socket
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Case, When, Value, DateTimeField, PositiveIntegerField, Q
+from django.utils import timezone
+
+from .cache import invalidate_watches
+from .models import Watch
+
+
+def default_worker_name() -> str:
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+class Scheduler(object):
+    """ Claims due watches and moves their `next_check` forward.
+
+    Claimed watches are leased to `worker` until `lease` passes, so several
+    workers can share one database without fetching the same watch twice.
+    Watches leased by a worker which crashed become claimable again once
+    their lease expires.
+
+    Every reschedule is delayed by a random jitter of up to `jitter` of the
+    watch period (but no more than `max_jitter`), so watches sharing a period
+    drift apart instead of firing in the same second forever.
+
+    Watches whose page could not be fetched `failures` times in a row wait
+    their period doubled as many times, up to `max_backoff` (but never less
+    than their period).
+    """
+
+    def __init__(self, batch_size: int = 500, jitter: float = 0.05, max_jitter: timedelta = timedelta(minutes=5),
+                 worker: str = None, lease: timedelta = timedelta(minutes=5),
+                 max_backoff: timedelta = timedelta(days=1)):
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self.max_jitter = max_jitter
+        self.worker = worker or default_worker_name()
+        self.lease = lease
+        self.max_backoff = max_backoff
+
+    def claim_due(self, now=None) -> list:
+        """ Lease up to `batch_size` watches whose `next_check` has passed, most overdue first. """
+        now = now or timezone.now()
+        expires = now + self.lease
+        due = (Watch.objects
+               .filter(next_check__lte=now)
+               .filter(Q(lease_expires__isnull=True) | Q(lease_expires__lte=now))
+               .order_by('next_check'))
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                watches = list(due.select_for_update(skip_locked=True)[:self.batch_size])
+                Watch.objects.filter(pk__in=[watch.pk for watch in watches]).update(
+                    lease_owner=self.worker, lease_expires=expires)
+            for watch in watches:
+                watch.lease_owner = self.worker
+                watch.lease_expires = expires
+            return watches
+
+        # No row locks (SQLite): take the lease with a compare-and-set UPDATE,
+        # which only succeeds for candidates nobody else has leased meanwhile.
+        candidates = list(due.values_list('pk', flat=True)[:self.batch_size])
+        if not candidates:
+            return []
+        due.order_by().filter(pk__in=candidates).update(lease_owner=self.worker, lease_expires=expires)
+        return list(Watch.objects.filter(pk__in=candidates, lease_owner=self.worker, lease_expires=expires)
+                    .order_by('next_check'))
+
+    def advance(self, watches, now=None, retry_after: dict = None, deferred=()):
+        """ Set `next_check` of all `watches` to one period (plus jitter and backoff) from `now`, save their
+        `failures` and release their leases.
+
+        `retry_after` maps watch ids to seconds their host asked to wait, which delay next check even more.
+        Watches whose ids are in `deferred` were not checked at all, as their request was held back: they
+        are due again just when their `retry_after` passes.
+        Done with a single UPDATE. Watches whose lease has been taken over by another worker are left alone.
+        """
+        now = now or timezone.now()
+        retry_after = retry_after or {}
+        whens, failures = [], []
+        for watch in watches:
+            if watch.pk in deferred:
+                watch.next_check = now + timedelta(seconds=retry_after.get(watch.pk, 0))
+            else:
+                delay = self.get_delay(watch)
+                if watch.pk in retry_after:
+                    delay = max(delay, timedelta(seconds=retry_after[watch.pk]))
+                watch.next_check = now + delay + self.get_jitter(watch.period)
+            watch.lease_owner = ""
+            watch.lease_expires = None
+            whens.append(When(pk=watch.pk, then=Value(watch.next_check)))
+            failures.append(When(pk=watch.pk, then=Value(watch.failures)))
+        if whens:
+            pks = [watch.pk for watch in watches]
+            Watch.objects.filter(pk__in=pks, lease_owner=self.worker).update(
+                next_check=Case(*whens, output_field=DateTimeField()),
+                failures=Case(*failures, output_field=PositiveIntegerField()), lease_owner="", lease_expires=None)
+            invalidate_watches(pks)
+
+    def get_delay(self, watch: Watch) -> timedelta:
+        """ Return time from a check of `watch` to the next one, backed off after failures. """
+        if not watch.failures:
+            return watch.period
+        # Cap the exponent too, so the multiplication cannot overflow
+        backoff = watch.period * 2 ** min(watch.failures, 32)
+        return max(watch.period, min(backoff, self.max_backoff))
+
+    def get_jitter(self, period: timedelta) -> timedelta:
+        limit = min(period * self.jitter, self.max_jitter)
+        return timedelta(seconds=random.uniform(0, limit.total_seconds()))
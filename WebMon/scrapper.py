@@ -1,4 +1,19 @@
-from lxml import html
+import re
+from functools import lru_cache
+
+from lxml import etree, html
+
+XPATH_CACHE_SIZE = 512
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_MAX_SIZE = 10 * 1024 * 1024
+
+# `(expression)[N]` selects the N-th match only, later input cannot change it, nor text or an attribute of it
+FIRST_MATCHES_XPATH = re.compile(r'^\(.*\)\[\d+\](/text\(\)|/@[\w:.-]+)?$', re.DOTALL)
+
+
+@lru_cache(maxsize=XPATH_CACHE_SIZE)
+def compile_xpath(xpath: str) -> etree.XPath:
+    return etree.XPath(xpath)
 
 
 class Scrapper(object):
@@ -6,11 +21,17 @@ class Scrapper(object):
         self.content = content
         self.xpath = xpath
         self.value = None
+        self._tree = None
 
     def get_value(self):
         self._extract_xpath()
         return self.value
 
+    def get_values(self, xpaths) -> list:
+        """ Extract values for many XPaths, parsing content only once. """
+        tree = self._get_tree()
+        return [self._evaluate(tree, xpath) for xpath in xpaths]
+
     def set_xpath(self, xpath: str):
         self.xpath = xpath
 
@@ -19,10 +40,102 @@ class Scrapper(object):
 
     def set_content(self, content: str):
         self.content = content
+        self._tree = None
 
     def get_content(self) -> str:
         return self.content
 
+    def _get_tree(self):
+        # Parsed tree is kept until content changes
+        if self._tree is None:
+            self._tree = html.fromstring(self.content)
+        return self._tree
+
     def _extract_xpath(self):
-        tree = html.fromstring(self.content)  # type: html
-        self.value = ' '.join(tree.xpath(self.xpath))
+        self.value = self._evaluate(self._get_tree(), self.xpath)
+
+    @staticmethod
+    def _evaluate(tree, xpath: str) -> str:
+        return ' '.join(compile_xpath(xpath)(tree))
+
+
+class ContentTooLarge(ValueError):
+    pass
+
+
+class StreamScrapper(object):
+    """ Extracts values for many XPaths from a page fed in chunks of bytes.
+
+    Bytes are parsed as they come, without building the whole page as `str`. More than `max_size`
+    bytes raise `ContentTooLarge`. When every XPath selects a single positioned match, written as
+    `(expression)[N]`, optionally followed by `/text()` or `/@attribute`, feeding stops as soon as
+    all of them matched complete nodes. XPaths are evaluated again only once the fed size doubled
+    since the last try, so looking for matches costs time linear in page size.
+    This assumes a match is not affected by content after it, which holds unless a predicate
+    looks at descendants of a node that is still being parsed.
+
+    Memory use is not bounded by streaming: the parser keeps the tree of everything fed so far, as
+    XPaths may select any part of it. Only the decoded `str` copy of the page is avoided.
+    """
+
+    def __init__(self, xpaths, max_size: int = STREAM_MAX_SIZE, encoding: str = None):
+        self.xpaths = list(xpaths)
+        self.max_size = max_size
+        self.size = 0
+        self.values = None
+        self._parser = etree.HTMLPullParser(events=('end',), encoding=encoding)
+        self._root = None
+        self._early_stop = all(FIRST_MATCHES_XPATH.match(xpath) for xpath in self.xpaths)
+        self._next_check = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """ Parse next chunk of the page. Returns True when all values are known and feeding can stop. """
+        if self.values is not None:
+            return True
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise ContentTooLarge("Page is larger than {} bytes".format(self.max_size))
+
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            if self._root is None:
+                self._root = element.getroottree().getroot()
+
+        if self._early_stop and self._root is not None and self.size >= self._next_check:
+            self._next_check = self.size * 2
+            results = [compile_xpath(xpath)(self._root) for xpath in self.xpaths]
+            if all(result and all(self._is_complete(node) for node in result) for result in results):
+                self.values = [' '.join(result) for result in results]
+        return self.values is not None
+
+    def get_values(self) -> list:
+        if self.values is None:
+            root = self._parser.close()
+            if root is None:
+                raise etree.ParserError("Document is empty")
+            self.values = [Scrapper._evaluate(root, xpath) for xpath in self.xpaths]
+        return self.values
+
+    @staticmethod
+    def _is_complete(node) -> bool:
+        if getattr(node, 'is_attribute', False):
+            return True
+        element = node.getparent() if isinstance(node, str) else node
+        if getattr(node, 'is_tail', False):
+            element = element.getparent()
+        # Parser only moves past an element once it is closed
+        return element is not None and element.xpath('boolean(following::node())')
+
+
+def stream_values(chunks, xpaths, max_size: int = STREAM_MAX_SIZE, encoding: str = None) -> list:
+    """ Extract values for `xpaths` from an iterable of byte chunks, stopping early where possible. """
+    scrapper = StreamScrapper(xpaths, max_size=max_size, encoding=encoding)
+    for chunk in chunks:
+        if scrapper.feed(chunk):
+            break
+    return scrapper.get_values()
+
+
+def iter_chunks(body: bytes, size: int = STREAM_CHUNK_SIZE):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
@@ -1,6 +1,9 @@
+from collections import OrderedDict
+
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
+from .extractors import get_extractor
 from .models import Watch, Value
 
 
@@ -9,7 +12,16 @@ class WatchSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Watch
-        fields = ('id', 'name', 'url', 'xpath', 'period', 'next_check', 'notify', 'owner')
+        fields = ('id', 'name', 'url', 'xpath', 'extractor', 'period', 'next_check', 'notify', 'webhook_url', 'owner')
+
+    def validate(self, data):
+        extractor = data.get('extractor', self.instance.extractor if self.instance else 'xpath')
+        expression = data.get('xpath', self.instance.xpath if self.instance else '')
+        try:
+            get_extractor(extractor).validate(expression)
+        except ValueError as e:
+            raise serializers.ValidationError({'xpath': [str(e)]})
+        return data
 
 
 class ValueSerializer(serializers.ModelSerializer):
@@ -17,11 +29,78 @@ class ValueSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Value
-        fields = ('id', 'watch', 'created', 'content')
+        fields = ('id', 'watch', 'created', 'last_seen', 'checks_count', 'content')
+
+
+# Fast paths for read-heavy listings: `.values()` rows serialized to the same output as the
+# model serializers, without model instances and per-field serializer objects.
+
+# Fields of `.values()` rows which `watch_row_data` turns into `WatchSerializer` output
+WATCH_ROW_FIELDS = ('id', 'name', 'url', 'xpath', 'extractor', 'period', 'next_check', 'notify', 'webhook_url',
+                    'owner__username')
+
+# Fields of `.values()` rows which `value_row_data` turns into `ValueSerializer` output
+VALUE_ROW_FIELDS = ('id', 'watch_id', 'created', 'last_seen', 'checks_count', 'content')
+
+_datetime_field = serializers.DateTimeField()
+_duration_field = serializers.DurationField()
+
+
+def watch_row_data(row: dict) -> dict:
+    """ Serialize a `Watch` row the same way `WatchSerializer` does, without building a model instance. """
+    return OrderedDict((
+        ('id', row['id']),
+        ('name', row['name']),
+        ('url', row['url']),
+        ('xpath', row['xpath']),
+        ('extractor', row['extractor']),
+        ('period', _duration_field.to_representation(row['period'])),
+        ('next_check', _datetime_field.to_representation(row['next_check'])),
+        ('notify', row['notify']),
+        ('webhook_url', row['webhook_url']),
+        ('owner', row['owner__username']),
+    ))
+
+
+# Fields a value listing can be narrowed to with `?fields=`, mapped to the `.values()` columns they are read from.
+# `length` and `digest` summarize the content without reading it.
+VALUE_LISTING_FIELDS = OrderedDict((
+    ('id', 'id'),
+    ('watch', 'watch_id'),
+    ('created', 'created'),
+    ('last_seen', 'last_seen'),
+    ('checks_count', 'checks_count'),
+    ('content', 'content'),
+    ('length', 'length'),
+    ('digest', 'digest'),
+))
+
+
+def get_value_row_columns(fields) -> list:
+    """ Return `.values()` columns needed to serialize `fields` of `VALUE_LISTING_FIELDS`. """
+    return [VALUE_LISTING_FIELDS[name] for name in fields]
+
+
+def value_row_data(row: dict, fields=ValueSerializer.Meta.fields) -> dict:
+    """ Serialize a `Value` row the same way `ValueSerializer` does, without building a model instance.
+
+    `fields` narrows the output to some of `VALUE_LISTING_FIELDS`, `row` only needs their columns.
+    """
+    return OrderedDict((name, _value_row_field(row, name)) for name in fields)
+
+
+def _value_row_field(row: dict, name: str):
+    value = row[VALUE_LISTING_FIELDS[name]]
+    if name in ('created', 'last_seen'):
+        return _datetime_field.to_representation(value)
+    if name == 'content':
+        # Compressed content is only decompressed here
+        return str(value)
+    return value
 
 
 class UserSerializer(serializers.ModelSerializer):
-    watches = serializers.PrimaryKeyRelatedField(many=True, queryset=Watch.objects.all())
+    watches = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
 
     class Meta:
         model = User
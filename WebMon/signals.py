@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_watch
+from .models import Watch, Value
+
+
+@receiver([post_save, post_delete], sender=Watch)
+def invalidate_watch_cache(sender, instance, **kwargs):
+    invalidate_watch(instance.pk)
+
+
+# Values are only deleted together with their watch or by retention, which invalidates on its own.
+# Having no delete receiver for them keeps cascade deletes fast.
+@receiver(post_save, sender=Value)
+def invalidate_value_cache(sender, instance, **kwargs):
+    invalidate_watch(instance.watch_id)
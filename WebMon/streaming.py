@@ -0,0 +1,77 @@
+import json
+import time
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import get_watch_versions
+from .models import Value
+from .serializers import get_value_row_columns, value_row_data
+
+
+def get_push_timeout() -> float:
+    """ Return `WEBMON_PUSH_TIMEOUT` setting, seconds a value stream is held open before the client reconnects. """
+    return getattr(settings, 'WEBMON_PUSH_TIMEOUT', 300)
+
+
+def get_push_interval() -> float:
+    """ Return `WEBMON_PUSH_INTERVAL` setting, seconds between looks for new values of a stream. """
+    return getattr(settings, 'WEBMON_PUSH_INTERVAL', 5)
+
+
+def get_push_max_watches() -> int:
+    """ Return `WEBMON_PUSH_MAX_WATCHES` setting, most watches whose cache versions a stream looks up at once. """
+    return getattr(settings, 'WEBMON_PUSH_MAX_WATCHES', 100)
+
+
+def format_event(event_id, event: str, data) -> str:
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(event_id, event, json.dumps(data, cls=JSONEncoder))
+
+
+def value_events(watch_pks, since: int, fields, timeout: float = None, interval: float = None,
+                 max_watches: int = None, heartbeat: float = 15, batch_size: int = 100, sleep=time.sleep,
+                 clock=time.monotonic):
+    """ Yield server-sent events with values of watches `watch_pks` created after value id `since`.
+
+    Every `interval` seconds the cache versions of up to `max_watches` of the watches, taken in turns,
+    are compared, and values are only queried when some watch changed. An idle stream still costs a
+    cache lookup per interval, which is a query with the database cache. With more watches than
+    `max_watches`, a new value may take several intervals to be pushed. Values ingested by
+    `fetch_watches` are seen through its invalidations, which is why the cache must be shared by
+    all processes (see check `WebMon.E001`). Event ids are value ids, so a client reconnecting
+    with `Last-Event-ID` continues where it left off. Stream ends after `timeout` seconds, in
+    between a comment is sent every `heartbeat` seconds to keep it open.
+    """
+    timeout = get_push_timeout() if timeout is None else timeout
+    interval = get_push_interval() if interval is None else interval
+    max_watches = get_push_max_watches() if max_watches is None else max_watches
+    watch_pks = list(watch_pks)
+    columns = {'id'} | set(get_value_row_columns(fields))
+    deadline = clock() + timeout
+    quiet_since = clock()
+    versions, offset, look = {}, 0, True
+
+    yield 'retry: {}\n\n'.format(int(interval * 1000))
+    while True:
+        current = get_watch_versions(watch_pks[offset:offset + max_watches])
+        offset = offset + max_watches if offset + max_watches < len(watch_pks) else 0
+        if look or any(versions.get(pk) != version for pk, version in current.items()):
+            rows = list(Value.objects.filter(watch__in=watch_pks, pk__gt=since).order_by('pk')
+                        .values(*columns)[:batch_size])
+            for row in rows:
+                since = row['id']
+                yield format_event(since, 'value', value_row_data(row, fields))
+            if rows:
+                quiet_since = clock()
+            versions.update(current)
+            # Full batch may have more values behind it, look again without waiting
+            look = len(rows) >= batch_size
+            if look:
+                continue
+
+        if clock() >= deadline:
+            return
+        if clock() - quiet_since >= heartbeat:
+            quiet_since = clock()
+            yield ': heartbeat\n\n'
+        sleep(interval)
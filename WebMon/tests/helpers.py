@@ -0,0 +1,20 @@
+from ..ingest import ValueIngester
+from ..models import Value, Watch
+
+# Cache which makes no database queries, for tests counting queries of the code under test
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def ingest_value(watch: Watch, content: str, checked=None) -> Value:
+    """ Store `content` extracted from `watch` the way a check does, return the latest value of the watch. """
+    # As claimed by the scheduler, with its current latest value
+    watch.refresh_from_db()
+    ingester = ValueIngester()
+    ingester.add(watch, content, checked)
+    ingester.flush()
+    watch.refresh_from_db()
+    return watch.latest_value
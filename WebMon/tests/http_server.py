@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+from collections import Counter
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+TEST_FILES_DIR = os.path.join(os.path.dirname(__file__), 'test_files')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.hits[self.path] += 1
+        if self.path in self.server.responses:
+            status, headers = self.server.responses[self.path]
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.path in self.server.pages:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(self.server.pages[self.path])))
+            self.end_headers()
+            # Client may stop reading before the end, so the connection is not reused
+            self.close_connection = True
+            try:
+                self.wfile.write(self.server.pages[self.path])
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+
+        file_name = os.path.join(TEST_FILES_DIR, self.path.lstrip('/'))
+        if not os.path.isfile(file_name):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        with open(file_name, 'rb') as f:
+            body = f.read()
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.server.etags and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if self.server.etags:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.hits[self.path] += 1
+        self.server.posts.append((self.path, self.rfile.read(int(self.headers.get('Content-Length', 0)))))
+        status, headers = self.server.responses.get(self.path, (200, {}))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestHTTPServer(object):
+    """ Local stand-in for monitored sites, serving files from `test_files`. """
+
+    def __init__(self, etags: bool = True):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.hits = Counter()
+        self.server.etags = etags
+        self.server.responses = {}
+        self.server.pages = {}
+        self.server.posts = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def hits(self) -> Counter:
+        return self.server.hits
+
+    @property
+    def posts(self) -> list:
+        """ (path, body) of received POST requests. """
+        return self.server.posts
+
+    def respond(self, path: str, status: int, headers: dict = None):
+        """ Answer requests of `path` with an empty response of `status` and `headers`. """
+        self.server.responses['/' + path.lstrip('/')] = (status, headers or {})
+
+    def serve(self, path: str, body: bytes):
+        """ Answer requests of `path` with HTML page `body`. """
+        self.server.pages['/' + path.lstrip('/')] = body
+
+    def url(self, path: str) -> str:
+        return 'http://127.0.0.1:{}/{}'.format(self.server.server_port, path.lstrip('/'))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
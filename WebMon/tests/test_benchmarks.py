@@ -0,0 +1,61 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..benchmarks import bench_serializers, bench_scrapper, bench_endpoints, bench_inserts, make_page, \
+    SCRAPPER_XPATHS
+from ..models import Watch, Value
+from ..scrapper import Scrapper
+from .http_server import TEST_FILES_DIR
+
+
+class BenchmarksTest(TestCase):
+    def assertNoData(self):
+        self.assertEqual(User.objects.count(), 0)
+        self.assertEqual(Watch.objects.count(), 0)
+        self.assertEqual(Value.objects.count(), 0)
+
+    def test_serializer_benchmark_leaves_no_data(self):
+        results = bench_serializers(rows=20, repeat=1)
+
+        self.assertEqual([result['name'] for result in results],
+                         ['watch_list.serializer', 'watch_list.values', 'value_list.serializer', 'value_list.values'])
+        self.assertNoData()
+
+    def test_scrapper_benchmark_covers_pages_and_xpaths(self):
+        results = bench_scrapper(sizes=[1000, 5000], corpus=TEST_FILES_DIR, repeat=1)
+
+        self.assertEqual([result['page'] for result in results[::len(SCRAPPER_XPATHS)]],
+                         ['synthetic', 'synthetic', 'test1.html', 'test2.html'])
+        self.assertGreaterEqual(results[len(SCRAPPER_XPATHS)]['size'], 5000)
+
+    def test_synthetic_page_matches_xpaths(self):
+        page = make_page(10000)
+
+        for _, xpath in SCRAPPER_XPATHS:
+            self.assertTrue(Scrapper(page, xpath).get_value(), xpath)
+
+    def test_endpoint_benchmark_leaves_no_data(self):
+        results = bench_endpoints(sizes=[10], repeat=1)
+
+        self.assertEqual([result['name'] for result in results],
+                         ['endpoint.watch_list', 'endpoint.watch_value_list', 'endpoint.watch_value_latest'])
+        self.assertNoData()
+
+    def test_insert_benchmark_reports_rates(self):
+        results = bench_inserts(rows=10, repeat=2)
+
+        self.assertEqual([result['name'] for result in results], ['insert.create', 'insert.ingester'])
+        self.assertTrue(all(result['per_second'] > 0 for result in results))
+        self.assertNoData()
+
+    def test_command_prints_json(self):
+        out = StringIO()
+        call_command('benchmark', 'scrapper', '--page-sizes=1000', '--repeat=1', '--json', stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertIn('python', report['environment'])
+        self.assertEqual(len(report['results']), len(SCRAPPER_XPATHS))
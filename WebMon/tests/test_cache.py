@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..cache import get_watch_version, invalidate_watch
+from ..checks import check_shared_cache
+from ..models import Watch, Value
+from .helpers import LOCMEM_CACHES, ingest_value
+
+
+class WatchResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.user2 = User.objects.create(username='second_user', password='test_test')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        Value.objects.create(watch=self.watch1, content="2.3.7")
+        self.url = reverse('watch-value-list', kwargs={'pk': self.watch1.pk})
+        self.client.force_login(self.user1)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_cached_response_is_served_without_value_queries(self):
+        first = self.client.get(self.url)
+
+        # Only session and user are loaded
+        with self.assertNumQueries(2):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_hit_is_cheaper_than_miss_with_project_cache(self):
+        self.client.force_authenticate(self.user1)
+        with CaptureQueriesContext(connection) as miss:
+            self.client.get(self.url)
+
+        # version and response are looked up together
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        # watch and values of the view itself
+        self.assertGreater(len(miss), 2)
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_new_value_invalidates_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        Value.objects.create(watch=self.watch1, content="2.4.5")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([value['content'] for value in response.data], ["2.3.7", "2.4.5"])
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_repeated_value_invalidates_cache(self):
+        with self.settings(WEBMON_VALUE_STORAGE='changes'):
+            self.client.get(self.url)
+            self.watch1.refresh_from_db()
+            ingest_value(self.watch1, "2.3.7")
+
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data[0]['checks_count'], 2)
+
+    def test_cache_is_per_user(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user2)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SingleRowResponseTest(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        Value.objects.create(watch=self.watch1, content="2.3.7")
+        self.url = reverse('watch-value-latest', kwargs={'pk': self.watch1.pk})
+        self.client.force_authenticate(self.user1)
+
+    def test_single_row_is_not_cached(self):
+        # The value itself, no cache lookups with the project cache
+        with self.assertNumQueries(1):
+            etag = self.client.get(self.url)['ETag']
+        Value.objects.create(watch=self.watch1, content="2.4.5")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.data['content'], "2.4.5")
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_watch_update_is_served(self):
+        url = reverse('watch-detail', kwargs={'pk': self.watch1.pk})
+        self.client.get(url)
+        self.watch1.name = 'renamed'
+        self.watch1.save()
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.data['name'], 'renamed')
+
+
+class InvalidateOnCommitTest(TransactionTestCase):
+    def test_version_taken_before_commit_is_stale_after_it(self):
+        with transaction.atomic():
+            invalidate_watch(1)
+            # A concurrent request caching data from before the commit would use this version
+            version = get_watch_version(1)
+
+        self.assertNotEqual(get_watch_version(1), version)
+
+    def test_process_local_cache_is_rejected(self):
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES=LOCMEM_CACHES):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['WebMon.E001'])
@@ -0,0 +1,106 @@
+import os
+from datetime import timedelta
+from unittest import TestCase, mock
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import parsing
+from ..engine import check_due_watches
+from ..fetcher import Fetcher
+from ..models import Watch
+from ..parsing import extract_values, ExtractionError
+from .http_server import TestHTTPServer
+
+
+class ExtractorsTest(TestCase):
+    def setUp(self):
+        test_files = os.path.join(os.path.dirname(__file__), 'test_files')
+        self.test_html = open(os.path.join(test_files, 'test1.html')).read()
+        self.test_json = open(os.path.join(test_files, 'test3.json')).read()
+
+    def test_xpath_and_css_share_one_parse(self):
+        values = extract_values(self.test_html, [('xpath', '//*[@class="version"]/text()'),
+                                                 ('css', '.revision strong'),
+                                                 ('css', '.revision')])
+
+        self.assertEqual(values, ['2.3.7', '1-3', '1-3'])
+
+    def test_css_selector_group(self):
+        expressions = [('css', '.version, .revision strong')]
+
+        self.assertEqual(extract_values(self.test_html, expressions), ['2.3.7 1-3'])
+        self.assertEqual(extract_values(self.test_html.encode(), expressions), ['2.3.7 1-3'])
+
+    def test_regex(self):
+        values = extract_values(self.test_html, [('regex', r'class="version">([\d.]+)<'),
+                                                 ('regex', r'\d-\d')])
+
+        self.assertEqual(values, ['2.3.7', '1-3'])
+
+    def test_json_path(self):
+        values = extract_values(self.test_json, [('json', '$.releases[0].version'),
+                                                 ('json', 'releases[*].stable'),
+                                                 ('json', '$.missing')])
+
+        self.assertEqual(values, ['2.3.7', 'true false', ''])
+
+    def test_raw_extractors_skip_html_parse(self):
+        with mock.patch.object(parsing, 'Scrapper') as scrapper:
+            extract_values(self.test_json, [('json', '$.name'), ('regex', 'Example')])
+
+        scrapper.assert_not_called()
+
+    def test_invalid_expressions(self):
+        values = extract_values(self.test_json, [('json', '$.releases['), ('regex', '('), ('css', 'div['),
+                                                 ('nope', 'x'), ('json', '$.name')])
+
+        for value in values[:4]:
+            self.assertIsInstance(value, ExtractionError)
+        self.assertEqual(values[4], 'Example')
+
+
+class ExtractorWatchTest(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+
+    def test_expression_is_validated_by_extractor(self):
+        self.client.force_login(self.user1)
+        data = {'name': 'json', 'url': 'http://example.com/api', 'xpath': '$.items[', 'extractor': 'json',
+                'period': timedelta(hours=1)}
+
+        response = self.client.post(reverse('watch-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('xpath', response.data)
+
+        data['xpath'] = '$.items[0]'
+        response = self.client.post(reverse('watch-list'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Watch.objects.get().extractor, 'json')
+
+    def test_json_watch_is_checked(self):
+        server = TestHTTPServer()
+        server.start()
+        self.addCleanup(server.stop)
+        watch = Watch.objects.create(name='json', url=server.url('test3.json'), xpath='$.releases[0].version',
+                                     extractor='json', period=timedelta(hours=1), owner=self.user1)
+        Watch.objects.filter(pk=watch.pk).update(next_check=timezone.now())
+
+        check_due_watches(Fetcher())
+
+        self.assertEqual(watch.values.get().content, '2.3.7')
+
+    def test_changing_extractor_resets_validators(self):
+        watch = Watch.objects.create(name='json', url='http://example.com/api', xpath='name',
+                                     extractor='json', period=timedelta(hours=1), owner=self.user1)
+        Watch.objects.filter(pk=watch.pk).update(content_hash='abc')
+        watch = Watch.objects.get()
+
+        watch.extractor = 'regex'
+        watch.save()
+
+        watch.refresh_from_db()
+        self.assertEqual(watch.content_hash, '')
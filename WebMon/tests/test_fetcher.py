@@ -0,0 +1,332 @@
+import itertools
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import ingest
+from ..engine import check_due_watches
+from ..fetcher import Fetcher, FetchResult, HostThrottled, TokenBucket, parse_retry_after
+from ..models import Watch
+from ..parsing import InlineParser
+from ..scheduler import Scheduler
+from ..scrapper import ContentTooLarge
+from .http_server import TestHTTPServer
+
+
+def make_large_page() -> bytes:
+    rows = ''.join('<div class="row"><span class="item">{}</span></div>'.format(i) for i in range(50000))
+    return '<html><body>{}</body></html>'.format(rows).encode()
+
+
+class FetcherTest(TestCase):
+    def setUp(self):
+        self.server = TestHTTPServer()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_fetches_all_urls_in_order(self):
+        urls = [self.server.url('test1.html'), self.server.url('missing.html'), self.server.url('test2.html')]
+
+        results = Fetcher(concurrency=2, per_host=1).fetch_all(urls)
+
+        self.assertEqual([result.url for result in results], urls)
+        self.assertEqual([result.status for result in results], [200, 404, 200])
+        self.assertIn('2.3.7', results[0].get_text())
+
+    def test_large_body_is_not_read(self):
+        results = Fetcher(max_size=100).fetch_all([self.server.url('test1.html')])
+
+        self.assertFalse(results[0].ok)
+        self.assertIsInstance(results[0].error, ContentTooLarge)
+
+    def test_connection_error_is_reported(self):
+        results = Fetcher(timeout=5).fetch_all(['http://127.0.0.1:1/'])
+
+        self.assertFalse(results[0].ok)
+        self.assertIsNotNone(results[0].error)
+
+    def test_retry_after_blocks_host(self):
+        self.server.respond('busy.html', 503, {'Retry-After': '120'})
+        fetcher = Fetcher()
+
+        busy, = fetcher.fetch_all([self.server.url('busy.html')])
+        blocked, = fetcher.fetch_all([self.server.url('test1.html')])
+
+        self.assertEqual(busy.status, 503)
+        self.assertEqual(busy.retry_after, 120)
+        self.assertIsInstance(blocked.error, HostThrottled)
+        self.assertGreater(blocked.retry_after, 100)
+        self.assertEqual(self.server.hits['/test1.html'], 0)
+
+    def test_download_stops_once_positioned_matches_are_found(self):
+        self.server.serve('large.html', make_large_page())
+        url = self.server.url('large.html')
+
+        result, = Fetcher().fetch_all([url], stream_xpaths={url: ['(//*[@class="item"])[3]/text()']},
+                                      stream_threshold=1024)
+
+        self.assertEqual(result.values, ['2'])
+        self.assertLess(len(result.body), len(make_large_page()) // 10)
+
+    def test_page_under_stream_threshold_is_downloaded_whole(self):
+        self.server.serve('large.html', make_large_page())
+        url = self.server.url('large.html')
+
+        result, = Fetcher().fetch_all([url], stream_xpaths={url: ['(//*[@class="item"])[3]/text()']},
+                                      stream_threshold=len(make_large_page()))
+
+        self.assertIsNone(result.values)
+        self.assertEqual(result.body, make_large_page())
+
+    def test_requests_over_rate_limit_are_deferred(self):
+        urls = [self.server.url('test1.html'), self.server.url('test2.html'), self.server.url('missing.html')]
+
+        results = Fetcher(host_rate=1, host_burst=1, max_wait=0.5).fetch_all(urls)
+
+        self.assertEqual(results[0].status, 200)
+        for result in results[1:]:
+            self.assertIsInstance(result.error, HostThrottled)
+            self.assertGreater(result.retry_after, 0.5)
+        self.assertEqual(self.server.hits['/test2.html'] + self.server.hits['/missing.html'], 0)
+
+
+class TokenBucketTest(TestCase):
+    def test_burst_then_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+
+        self.assertEqual([bucket.reserve() for _ in range(5)], [0, 0, 0, 0.5, 1.0])
+        now[0] = 10.0
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_wait_takes_no_token(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=1, clock=lambda: now[0])
+
+        self.assertEqual(bucket.get_wait(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.get_wait(), 0.5)
+        self.assertEqual(bucket.get_wait(), 0.5)
+        self.assertEqual(bucket.reserve(), 0.5)
+
+    def test_refilled_bucket_is_full(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+
+        self.assertTrue(bucket.is_full())
+        bucket.reserve()
+        self.assertFalse(bucket.is_full())
+        now[0] = 0.5
+        self.assertTrue(bucket.is_full())
+
+    def test_idle_hosts_are_forgotten(self):
+        fetcher = Fetcher(host_rate=1, host_burst=1)
+        busy, idle = TokenBucket(rate=1, burst=1), TokenBucket(rate=1, burst=1)
+        busy.reserve()
+        fetcher._buckets = {'busy.example': busy, 'idle.example': idle}
+        fetcher._blocked = {'busy.example': time.monotonic() + 60, 'idle.example': time.monotonic() - 1}
+
+        fetcher.fetch_all([])
+        self.assertEqual(list(fetcher._buckets), ['busy.example'])
+        self.assertEqual(list(fetcher._blocked), ['busy.example'])
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('120'), 120)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+
+class CheckDueWatchesTest(TestCase):
+    def setUp(self):
+        self.server = TestHTTPServer()
+        self.server.start()
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.due_watch = Watch.objects.create(name='watch1', url=self.server.url('test1.html'),
+                                              xpath='//*[@class="version"]/text()',
+                                              period=timedelta(hours=1), owner=self.user1)
+        self.future_watch = Watch.objects.create(name='watch2', url=self.server.url('test2.html'),
+                                                 xpath='//*[@class="version"]/text()',
+                                                 period=timedelta(hours=1), owner=self.user1)
+        Watch.objects.filter(pk=self.due_watch.pk).update(next_check=timezone.now() - timedelta(minutes=1))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_only_due_watches_are_checked(self):
+        now = timezone.now()
+        checked = check_due_watches(Fetcher(), Scheduler(jitter=0), clock=lambda: now)
+
+        self.assertEqual(checked, 1)
+        self.assertEqual(self.due_watch.values.get().content, '2.3.7')
+        self.assertEqual(self.future_watch.values.count(), 0)
+        self.assertEqual(self.server.hits['/test2.html'], 0)
+
+        self.due_watch.refresh_from_db()
+        self.assertEqual(self.due_watch.next_check, now + timedelta(hours=1))
+
+    @override_settings(WEBMON_STREAM_THRESHOLD=0)
+    def test_streaming_parse(self):
+        check_due_watches(Fetcher())
+
+        self.assertEqual(self.due_watch.values.get().content, '2.3.7')
+
+    def test_failed_fetch_is_backed_off(self):
+        Watch.objects.filter(pk=self.due_watch.pk).update(url=self.server.url('missing.html'))
+        now = timezone.now()
+
+        with self.assertLogs('WebMon.engine', 'WARNING'):
+            check_due_watches(Fetcher(), Scheduler(jitter=0), clock=lambda: now)
+
+        self.due_watch.refresh_from_db()
+        self.assertEqual(self.due_watch.values.count(), 0)
+        self.assertEqual(self.due_watch.failures, 1)
+        self.assertEqual(self.due_watch.next_check, now + timedelta(hours=2))
+
+    def test_successful_fetch_resets_failures(self):
+        Watch.objects.filter(pk=self.due_watch.pk).update(failures=3)
+        now = timezone.now()
+
+        check_due_watches(Fetcher(), Scheduler(jitter=0), clock=lambda: now)
+
+        self.due_watch.refresh_from_db()
+        self.assertEqual(self.due_watch.failures, 0)
+        self.assertEqual(self.due_watch.next_check, now + timedelta(hours=1))
+
+    def test_retry_after_delays_next_check(self):
+        self.server.respond('busy.html', 429, {'Retry-After': '10800'})
+        Watch.objects.filter(pk=self.due_watch.pk).update(url=self.server.url('busy.html'))
+        now = timezone.now()
+
+        with self.assertLogs('WebMon.engine', 'WARNING'):
+            check_due_watches(Fetcher(), Scheduler(jitter=0), clock=lambda: now)
+
+        self.due_watch.refresh_from_db()
+        self.assertEqual(self.due_watch.next_check, now + timedelta(hours=3))
+
+    def test_deferred_watch_keeps_failures(self):
+        Watch.objects.filter(pk__in=[self.due_watch.pk, self.future_watch.pk]).update(
+            failures=2, next_check=timezone.now() - timedelta(minutes=1))
+        now = timezone.now()
+
+        check_due_watches(Fetcher(host_rate=1, host_burst=1, max_wait=0), Scheduler(jitter=0), clock=lambda: now)
+
+        checked, deferred = sorted(Watch.objects.all(), key=lambda watch: watch.failures)
+        self.assertEqual(checked.failures, 0)
+        self.assertEqual(checked.next_check, now + timedelta(hours=1))
+        self.assertEqual(deferred.failures, 2)
+        self.assertGreater(deferred.next_check, now)
+        self.assertLessEqual(deferred.next_check, now + timedelta(seconds=1))
+        self.assertEqual(deferred.values.count(), 0)
+
+    @override_settings(WEBMON_STREAM_THRESHOLD=1024)
+    def test_large_page_is_scrapped_while_downloading(self):
+        self.server.serve('large.html', make_large_page())
+        Watch.objects.filter(pk=self.due_watch.pk).update(url=self.server.url('large.html'),
+                                                          xpath='(//*[@class="item"])[3]/text()')
+        parsed = []
+
+        class RecordingParser(InlineParser):
+            def extract_all(self, jobs):
+                parsed.extend(jobs)
+                return super(RecordingParser, self).extract_all(parsed)
+
+        check_due_watches(Fetcher(), parser=RecordingParser())
+
+        self.assertEqual(self.due_watch.values.get().content, '2')
+        self.assertEqual(parsed, [])
+
+    def test_shared_url_is_fetched_once(self):
+        user2 = User.objects.create(username='another_user', password='pass_pass')
+        revision_watch = Watch.objects.create(name='watch3', url=self.server.url('test1.html'),
+                                              xpath='//*[@class="revision"]/strong/text()',
+                                              period=timedelta(hours=1), owner=user2)
+        Watch.objects.filter(pk=revision_watch.pk).update(next_check=timezone.now() - timedelta(minutes=1))
+
+        checked = check_due_watches(Fetcher())
+
+        self.assertEqual(checked, 2)
+        self.assertEqual(self.server.hits['/test1.html'], 1)
+        self.assertEqual(self.due_watch.values.get().content, '2.3.7')
+        self.assertEqual(revision_watch.values.get().content, '1-3')
+
+    def test_late_batches_are_leased_from_their_claim(self):
+        Watch.objects.filter(pk=self.future_watch.pk).update(next_check=timezone.now() - timedelta(minutes=1))
+        clock = [timezone.now()]
+        claimed_by_other = []
+
+        class SlowFetcher(object):
+            """ Takes 3 minutes to fetch every batch, so the drain outlasts the 5 minutes lease. """
+            batches = 0
+
+            def fetch_all(self, urls, headers=None, **kwargs):
+                clock[0] += timedelta(minutes=3)
+                self.batches += 1
+                if self.batches == 2:
+                    claimed_by_other.extend(Scheduler(worker='other').claim_due(clock[0]))
+                return [FetchResult(url, status=304) for url in urls]
+
+        # Every buffered check is old enough to be flushed at once
+        monotonic = mock.Mock(side_effect=itertools.count(0, 60))
+        with mock.patch.object(ingest, 'time', mock.Mock(monotonic=monotonic)):
+            checked = check_due_watches(SlowFetcher(), Scheduler(batch_size=1, jitter=0), clock=lambda: clock[0])
+
+        self.assertEqual(checked, 2)
+        self.assertEqual(claimed_by_other, [])
+        self.future_watch.refresh_from_db()
+        self.assertEqual(self.future_watch.next_check, clock[0] + timedelta(hours=1))
+
+
+class ConditionalFetchTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch = Watch.objects.create(name='watch1', url='http://127.0.0.1/test1.html',
+                                          xpath='//*[@class="version"]/text()',
+                                          period=timedelta(hours=1), owner=self.user1)
+
+    def check(self, server):
+        Watch.objects.filter(pk=self.watch.pk).update(url=server.url('test1.html'),
+                                                      next_check=timezone.now() - timedelta(minutes=1))
+        check_due_watches(Fetcher())
+
+    def test_not_modified_page_stores_no_value(self):
+        server = TestHTTPServer(etags=True)
+        server.start()
+        self.addCleanup(server.stop)
+
+        self.check(server)
+        self.check(server)
+
+        self.assertEqual(self.watch.values.count(), 1)
+        self.watch.refresh_from_db()
+        self.assertTrue(self.watch.etag)
+
+    def test_unchanged_body_stores_no_value(self):
+        server = TestHTTPServer(etags=False)
+        server.start()
+        self.addCleanup(server.stop)
+
+        self.check(server)
+        self.check(server)
+
+        self.assertEqual(server.hits['/test1.html'], 2)
+        self.assertEqual(self.watch.values.count(), 1)
+
+    def test_changing_xpath_resets_validators(self):
+        server = TestHTTPServer(etags=True)
+        server.start()
+        self.addCleanup(server.stop)
+        self.check(server)
+
+        watch = Watch.objects.get()
+        watch.xpath = '//*[@class="revision"]/strong/text()'
+        watch.save()
+        self.check(server)
+
+        self.assertEqual(watch.values.latest('created').content, '1-3')
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..fields import CompressedText, COMPRESSED_PREFIX
+from ..models import Watch, Value
+from ..serializers import ValueSerializer, VALUE_ROW_FIELDS, value_row_data
+
+
+@override_settings(WEBMON_COMPRESS_THRESHOLD=100)
+class CompressedContentTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+
+    def get_stored(self, value: Value) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT content FROM "WebMon_value" WHERE id = %s', [value.pk])
+            return cursor.fetchone()[0]
+
+    def test_large_content_is_stored_compressed(self):
+        content = 'lorem ipsum ' * 100
+        value = Value.objects.create(watch=self.watch1, content=content)
+
+        stored = self.get_stored(value)
+        self.assertTrue(stored.startswith(COMPRESSED_PREFIX))
+        self.assertLess(len(stored), len(content))
+        self.assertEqual(Value.objects.get(pk=value.pk).content, content)
+
+    def test_small_content_is_stored_plain(self):
+        value = Value.objects.create(watch=self.watch1, content='2.3.7')
+
+        self.assertEqual(self.get_stored(value), '2.3.7')
+        self.assertEqual(Value.objects.get(pk=value.pk).content, '2.3.7')
+
+    def test_content_looking_compressed_is_escaped(self):
+        content = COMPRESSED_PREFIX + 'plain'
+        value = Value.objects.create(watch=self.watch1, content=content)
+
+        self.assertNotEqual(self.get_stored(value), content)
+        self.assertEqual(Value.objects.get(pk=value.pk).content, content)
+
+    def test_rows_are_decompressed_on_serialization(self):
+        content = 'ünïcödé ' * 100
+        value = Value.objects.create(watch=self.watch1, content=content)
+
+        row = Value.objects.values(*VALUE_ROW_FIELDS).get(pk=value.pk)
+        self.assertIsInstance(row['content'], CompressedText)
+        self.assertEqual(value_row_data(row)['content'], content)
+        self.assertEqual(ValueSerializer(Value.objects.get(pk=value.pk)).data['content'], content)
+
+    @override_settings(WEBMON_COMPRESS_THRESHOLD=None)
+    def test_compressed_rows_are_read_with_compression_disabled(self):
+        content = 'lorem ipsum ' * 100
+        with override_settings(WEBMON_COMPRESS_THRESHOLD=100):
+            value = Value.objects.create(watch=self.watch1, content=content)
+
+        self.assertEqual(Value.objects.get(pk=value.pk).content, content)
+        self.assertEqual(Value.objects.filter(pk=value.pk).defer('content').get().content, content)
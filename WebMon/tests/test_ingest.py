@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..ingest import ValueIngester
+from ..models import Watch, Value
+from ..scheduler import Scheduler
+from .helpers import LOCMEM_CACHES, ingest_value
+
+
+class StorageModeTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+
+    @override_settings(WEBMON_VALUE_STORAGE='changes')
+    def test_unchanged_content_extends_latest_value(self):
+        first = ingest_value(self.watch1, '2.3.7')
+        second = ingest_value(self.watch1, '2.3.7')
+
+        self.assertEqual(first.pk, second.pk)
+        value = Value.objects.get()
+        self.assertEqual(value.checks_count, 2)
+        self.assertGreater(value.last_seen, value.created)
+
+    @override_settings(WEBMON_VALUE_STORAGE='changes')
+    def test_changed_content_adds_value(self):
+        ingest_value(self.watch1, '2.3.7')
+        ingest_value(self.watch1, '2.4.5')
+        ingest_value(self.watch1, '2.3.7')
+
+        self.assertEqual(list(self.watch1.values.order_by('created').values_list('content', flat=True)),
+                         ['2.3.7', '2.4.5', '2.3.7'])
+
+    @override_settings(WEBMON_VALUE_STORAGE='all')
+    def test_all_mode_adds_value_on_every_check(self):
+        ingest_value(self.watch1, '2.3.7')
+        ingest_value(self.watch1, '2.3.7')
+
+        self.assertEqual(self.watch1.values.count(), 2)
+        self.assertEqual(set(self.watch1.values.values_list('checks_count', flat=True)), {1})
+
+
+@override_settings(WEBMON_VALUE_STORAGE='changes')
+class ChangeOnlyValueViewsTest(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        ingest_value(self.watch1, '2.3.7')
+        ingest_value(self.watch1, '2.4.5')
+        ingest_value(self.watch1, '2.4.5')
+
+    def test_latest_value_reports_repeated_checks(self):
+        self.client.force_login(self.user1)
+        response = self.client.get(reverse('watch-value-latest', kwargs={'pk': self.watch1.pk}))
+
+        self.assertEqual(response.data['content'], '2.4.5')
+        self.assertEqual(response.data['checks_count'], 2)
+
+    def test_value_list_contains_only_changes(self):
+        self.client.force_login(self.user1)
+        response = self.client.get(reverse('watch-value-list', kwargs={'pk': self.watch1.pk}))
+
+        self.assertEqual([value['content'] for value in response.data], ['2.3.7', '2.4.5'])
+
+
+@override_settings(WEBMON_VALUE_STORAGE='changes')
+class ValueIngesterTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watches = [Watch.objects.create(name='watch{}'.format(i), url='http://example.com/test{}'.format(i),
+                                             xpath='/books[1]', period=timedelta(hours=1), owner=self.user1)
+                        for i in range(3)]
+        self.now = timezone.now()
+
+    def test_values_are_written_on_size_threshold(self):
+        ingester = ValueIngester(max_size=3, max_age=60)
+        ingester.add(self.watches[0], 'a', self.now)
+        ingester.add(self.watches[1], 'b', self.now)
+        self.assertEqual(Value.objects.count(), 0)
+
+        ingester.add(self.watches[2], 'c', self.now)
+
+        self.assertEqual(Value.objects.count(), 3)
+        for watch, content in zip(self.watches, 'abc'):
+            watch.refresh_from_db()
+            self.assertEqual(watch.latest_value.content, content)
+            self.assertEqual(watch.latest_value.created, self.now)
+            self.assertEqual(watch.latest_value.length, 1)
+
+    def test_values_are_written_on_age_threshold(self):
+        ingester = ValueIngester(max_size=100, max_age=0)
+        ingester.add(self.watches[0], 'a', self.now)
+
+        self.assertEqual(Value.objects.count(), 1)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_flush_query_count_does_not_depend_on_batch_size(self):
+        ingester = ValueIngester(max_size=1000, max_age=60)
+        for i, watch in enumerate(self.watches * 10):
+            ingester.add(watch, str(i), self.now + timedelta(seconds=i))
+
+        # savepoint, insert, latest value pointers, release
+        with self.assertNumQueries(4):
+            ingester.flush()
+
+        self.assertEqual(Value.objects.count(), 30)
+        self.watches[0].refresh_from_db()
+        self.assertEqual(self.watches[0].latest_value.content, '27')
+
+    def test_repeated_content_bumps_latest_value(self):
+        ingest_value(self.watches[0], 'a')
+        ingester = ValueIngester(max_size=1000, max_age=60)
+        ingester.add(self.watches[0], 'a', self.now + timedelta(minutes=1))
+        ingester.add(self.watches[0], 'a', self.now + timedelta(minutes=2))
+        ingester.confirm([self.watches[0]], self.now + timedelta(minutes=3))
+        ingester.flush()
+
+        value = Value.objects.get()
+        self.assertEqual(value.checks_count, 4)
+        self.assertEqual(value.last_seen, self.now + timedelta(minutes=3))
+
+    def test_watches_are_rescheduled_in_flush(self):
+        scheduler = Scheduler(jitter=0)
+        Watch.objects.update(next_check=self.now)
+        watches = scheduler.claim_due(self.now)
+        ingester = ValueIngester(scheduler, max_size=1000, max_age=60)
+        ingester.add(watches[0], 'a', self.now)
+        ingester.set_validators(watches[:1], '"etag"', '', 'hash')
+        ingester.reschedule(watches, self.now)
+        self.assertEqual(scheduler.claim_due(self.now), [])
+
+        ingester.flush()
+
+        watch = Watch.objects.get(pk=watches[0].pk)
+        self.assertEqual(watch.etag, '"etag"')
+        self.assertEqual(watch.next_check, self.now + timedelta(hours=1))
+        self.assertEqual(watch.lease_owner, '')
@@ -0,0 +1,142 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..ingest import ValueIngester
+from ..models import Watch, Notification
+from ..notifications import Dispatcher
+from .helpers import ingest_value
+from .http_server import TestHTTPServer
+
+
+@override_settings(WEBMON_VALUE_STORAGE='changes', WEBMON_NOTIFY_WINDOW=timedelta(minutes=5))
+class EnqueueChangesTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass', email='user@example.com')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=1), notify=True,
+                                           webhook_url='http://example.com/hook', owner=self.user1)
+        self.now = timezone.now()
+
+    def ingest(self, *contents):
+        # As claimed again by the scheduler
+        self.watch1.refresh_from_db()
+        ingester = ValueIngester()
+        for content in contents:
+            ingester.add(self.watch1, content, self.now)
+        ingester.flush()
+
+    def test_change_is_queued_on_every_channel(self):
+        self.ingest('2.3.7')
+        self.assertFalse(Notification.objects.exists())
+
+        self.ingest('2.4.5')
+
+        notifications = Notification.objects.order_by('channel')
+        self.assertEqual([n.channel for n in notifications], [Notification.EMAIL, Notification.WEBHOOK])
+        for notification in notifications:
+            self.assertEqual(notification.previous.content, '2.3.7')
+            self.assertGreaterEqual(notification.due, self.now + timedelta(minutes=5))
+
+    def test_repeated_content_is_not_a_change(self):
+        self.ingest('2.3.7')
+        self.ingest('2.3.7')
+
+        self.assertFalse(Notification.objects.exists())
+
+    def test_pending_notification_coalesces_changes(self):
+        self.ingest('2.3.7')
+        self.ingest('2.4.5')
+        self.ingest('2.5.0', '2.6.1')
+
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(Notification.objects.filter(previous__content='2.3.7').count(), 2)
+
+    def test_watch_without_notify_is_ignored(self):
+        Watch.objects.filter(pk=self.watch1.pk).update(notify=False)
+        self.watch1.refresh_from_db()
+
+        ingest_value(self.watch1, '2.3.7')
+        ingest_value(self.watch1, '2.4.5')
+
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(WEBMON_VALUE_STORAGE='all')
+    def test_change_is_queued_when_storing_all_values(self):
+        self.user1.email = ''
+        self.user1.save()
+
+        ingest_value(self.watch1, '2.3.7')
+        ingest_value(self.watch1, '2.4.5')
+
+        self.assertEqual(Notification.objects.get().channel, Notification.WEBHOOK)
+
+
+class DispatcherTest(TestCase):
+    def setUp(self):
+        self.server = TestHTTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.user1 = User.objects.create(username='test_user', password='test_pass', email='user@example.com')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=1), notify=True,
+                                           webhook_url=self.server.url('hook'), owner=self.user1)
+        self.previous = ingest_value(self.watch1, '2.3.7')
+        ingest_value(self.watch1, '2.4.5')
+        Notification.objects.all().delete()
+        self.now = timezone.now()
+
+    def queue(self, channel, due=None):
+        return Notification.objects.create(watch=self.watch1, channel=channel, previous=self.previous,
+                                           created=self.now, due=due or self.now)
+
+    def test_webhook_and_email_are_sent(self):
+        webhook = self.queue(Notification.WEBHOOK)
+        email = self.queue(Notification.EMAIL)
+
+        self.assertEqual(Dispatcher().dispatch(self.now), {'sent': 2, 'failed': 0, 'dropped': 0})
+
+        path, body = self.server.posts[0]
+        self.assertEqual(path, '/hook')
+        self.assertEqual(json.loads(body.decode())['previous'], '2.3.7')
+        self.assertEqual(json.loads(body.decode())['current'], '2.4.5')
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+        self.assertIn('2.4.5', mail.outbox[0].body)
+        for notification in (webhook, email):
+            notification.refresh_from_db()
+            self.assertEqual(notification.state, Notification.SENT)
+
+    def test_notification_waits_for_window(self):
+        self.queue(Notification.WEBHOOK, due=self.now + timedelta(minutes=5))
+
+        self.assertEqual(Dispatcher().dispatch(self.now), {'sent': 0, 'failed': 0, 'dropped': 0})
+        self.assertEqual(self.server.posts, [])
+
+    def test_flapped_back_change_is_dropped(self):
+        self.queue(Notification.WEBHOOK)
+        ingest_value(self.watch1, '2.3.7')
+
+        self.assertEqual(Dispatcher().dispatch(self.now), {'sent': 0, 'failed': 0, 'dropped': 1})
+        self.assertFalse(Notification.objects.filter(channel=Notification.WEBHOOK).exists())
+
+    def test_failed_webhook_is_retried_then_given_up(self):
+        self.server.respond('hook', 500)
+        notification = self.queue(Notification.WEBHOOK)
+        dispatcher = Dispatcher(max_attempts=2, retry_delay=timedelta(minutes=1))
+
+        with self.assertLogs('WebMon.notifications', 'WARNING'):
+            self.assertEqual(dispatcher.dispatch(self.now), {'sent': 0, 'failed': 1, 'dropped': 0})
+        notification.refresh_from_db()
+        self.assertEqual(notification.state, Notification.PENDING)
+        self.assertEqual(notification.due, self.now + timedelta(minutes=1))
+        self.assertEqual(notification.error, 'HTTP 500')
+
+        with self.assertLogs('WebMon.notifications', 'WARNING'):
+            dispatcher.dispatch(self.now + timedelta(minutes=1))
+        notification.refresh_from_db()
+        self.assertEqual(notification.state, Notification.FAILED)
+        self.assertEqual(notification.attempts, 2)
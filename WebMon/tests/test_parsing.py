@@ -0,0 +1,49 @@
+import os
+from unittest import TestCase, mock
+
+from .. import parsing
+from ..parsing import ParsePool, InlineParser, ExtractionError, extract_values
+
+CRASH = '<html><body>crash</body></html>'
+
+
+def crashing_extract_values(content, xpaths):
+    if content == CRASH:
+        os._exit(1)
+    return extract_values(content, xpaths)
+
+
+class ParsePoolTest(TestCase):
+    def setUp(self):
+        test_file_name = os.path.join(os.path.dirname(__file__), 'test_files/test1.html')
+        self.test_html = open(test_file_name).read()
+        self.xpaths = ['//*[@class="version"]/text()', '//*[@class="revision"]/strong/text()']
+        self.pool = ParsePool(workers=2, chunk_size=2)
+        self.addCleanup(self.pool.close)
+
+    def test_pool_matches_inline_parser(self):
+        jobs = [(self.test_html, self.xpaths)] * 5
+
+        self.assertEqual(self.pool.extract_all(jobs), InlineParser().extract_all(jobs))
+        self.assertEqual(self.pool.extract_all(jobs)[0], ['2.3.7', '1-3'])
+
+    def test_errors_are_returned_per_xpath(self):
+        values = self.pool.extract_all([(self.test_html, ['//*[', self.xpaths[0]])])[0]
+
+        self.assertIsInstance(values[0], ExtractionError)
+        self.assertEqual(values[1], '2.3.7')
+
+    def test_bytes_are_parsed_in_streaming_mode(self):
+        values = self.pool.extract_all([(self.test_html.encode(), self.xpaths + ['//*['], 'utf-8')])[0]
+
+        self.assertEqual(values[:2], ['2.3.7', '1-3'])
+        self.assertIsInstance(values[2], ExtractionError)
+
+    def test_crashed_worker_fails_only_its_job(self):
+        with mock.patch.object(parsing, 'extract_values', crashing_extract_values), \
+                self.assertLogs('WebMon.parsing', 'WARNING'):
+            values = self.pool.extract_all([(self.test_html, self.xpaths), (CRASH, self.xpaths)])
+
+        self.assertEqual(values[0], ['2.3.7', '1-3'])
+        self.assertIsInstance(values[1][0], ExtractionError)
+        self.assertEqual(self.pool.extract_all([(self.test_html, self.xpaths)]), [['2.3.7', '1-3']])
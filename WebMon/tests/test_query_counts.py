@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import Watch, Value
+from ..serializers import UserSerializer
+from .helpers import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryCountTest(APITestCase):
+    """ Endpoints run a fixed number of queries, no matter how many watches and values there are.
+
+    Requests are authenticated without a session, so only queries of the views are counted.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.user2 = User.objects.create(username='second_user', password='test_test')
+        self.watches = [Watch.objects.create(name='watch{}'.format(i), url='http://example.com/test{}'.format(i),
+                                             xpath='/books[1]', period=timedelta(hours=5), owner=self.user1)
+                        for i in range(5)]
+        self.watch1 = self.watches[0]
+        for i in range(5):
+            Value.objects.create(watch=self.watch1, content='2.3.{}'.format(i))
+        self.client.force_authenticate(self.user1)
+
+    def get(self, name, queries, params=None, **kwargs):
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse(name, kwargs=kwargs), params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response
+
+    def test_watch_list(self):
+        response = self.get('watch-list', 1)
+
+        self.assertEqual(len(response.data), 5)
+
+    def test_watch_detail(self):
+        response = self.get('watch-detail', 1, pk=self.watch1.pk)
+
+        self.assertEqual(response.data['owner'], 'test_user')
+
+    def test_watch_detail_wrong_user(self):
+        self.client.force_authenticate(self.user2)
+
+        response = self.get('watch-detail', 1, pk=self.watch1.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_watch_value_latest(self):
+        response = self.get('watch-value-latest', 1, pk=self.watch1.pk)
+
+        self.assertEqual(response.data['content'], '2.3.4')
+
+    def test_watch_value_latest_fields(self):
+        response = self.get('watch-value-latest', 1, {'fields': 'id,digest'}, pk=self.watch1.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_watch_value_list(self):
+        # watch, values
+        response = self.get('watch-value-list', 2, pk=self.watch1.pk)
+
+        self.assertEqual(len(response.data), 5)
+
+    def test_watch_value_list_wrong_user(self):
+        self.client.force_authenticate(self.user2)
+
+        response = self.get('watch-value-list', 1, pk=self.watch1.pk)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_watch_value_export(self):
+        # watch, values
+        self.get('watch-value-export', 2, pk=self.watch1.pk, export_format='ndjson')
+
+    def test_user_serializer(self):
+        with self.assertNumQueries(1):
+            data = UserSerializer(self.user1).data
+
+        self.assertEqual(sorted(data['watches']), sorted(watch.pk for watch in self.watches))
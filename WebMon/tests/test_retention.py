@@ -0,0 +1,85 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Watch, Value
+from ..retention import RetentionPolicy
+
+
+class RetentionPolicyTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(minutes=15), notify=False, owner=self.user1)
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.policy = RetentionPolicy([(timedelta(days=1), None), (timedelta(days=3), timedelta(hours=1))])
+
+    def add_value(self, age: timedelta, watch=None):
+        value = Value.objects.create(watch=watch or self.watch1, content=str(age))
+        Value.objects.filter(pk=value.pk).update(created=self.now - age)
+        return value
+
+    def test_recent_values_are_kept(self):
+        for minutes in range(0, 120, 15):
+            self.add_value(timedelta(minutes=minutes))
+
+        self.assertEqual(self.policy.prune(self.now), {'downsampled': 0, 'expired': 0})
+        self.assertEqual(Value.objects.count(), 8)
+
+    def test_older_values_are_downsampled(self):
+        kept = []
+        for hours in (31, 32):
+            # Four values within one hour, the newest one stays
+            for minutes in (5, 20, 35, 50):
+                value = self.add_value(timedelta(hours=hours) - timedelta(minutes=minutes))
+            kept.append(value.pk)
+        self.add_value(timedelta(minutes=1))
+
+        deleted = self.policy.prune(self.now, batch_size=4)
+
+        self.assertEqual(deleted, {'downsampled': 6, 'expired': 0})
+        self.assertTrue(set(kept) < set(Value.objects.values_list('pk', flat=True)))
+        self.assertEqual(Value.objects.count(), 3)
+
+    def test_values_beyond_last_tier_are_deleted(self):
+        for days in (4, 5, 6):
+            self.add_value(timedelta(days=days))
+        recent = self.add_value(timedelta(hours=1))
+
+        deleted = self.policy.prune(self.now, batch_size=2)
+
+        self.assertEqual(deleted, {'downsampled': 0, 'expired': 3})
+        self.assertEqual(list(Value.objects.all()), [recent])
+
+    def test_latest_value_is_never_deleted(self):
+        self.add_value(timedelta(days=6))
+        latest = self.add_value(timedelta(days=5))
+
+        self.policy.prune(self.now)
+
+        self.assertEqual(list(Value.objects.all()), [latest])
+
+    def test_last_tier_without_age_keeps_old_values(self):
+        policy = RetentionPolicy([(timedelta(days=1), None), (None, timedelta(days=1))])
+        for days in (40, 50):
+            self.add_value(timedelta(days=days))
+            self.add_value(timedelta(days=days, minutes=1))
+        self.add_value(timedelta(hours=1))
+
+        self.assertEqual(policy.prune(self.now), {'downsampled': 2, 'expired': 0})
+        self.assertEqual(Value.objects.count(), 3)
+
+    @override_settings(WEBMON_VALUE_RETENTION=[(timedelta(days=1), None)])
+    def test_command_reports_deleted_values(self):
+        self.add_value(timedelta(days=2))
+        self.add_value(timedelta(days=3))
+        self.add_value(timedelta(hours=1))
+        out = StringIO()
+
+        call_command('prune_values', stdout=out)
+
+        self.assertIn('Deleted 2 values (0 downsampled, 2 expired).', out.getvalue())
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Watch
+from ..scheduler import Scheduler
+from .helpers import LOCMEM_CACHES
+
+
+class SchedulerTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.now = timezone.now()
+        for i in range(5):
+            watch = Watch.objects.create(name='watch{}'.format(i), url='http://example.com/test{}'.format(i),
+                                         xpath='/books[1]', period=timedelta(hours=1), owner=self.user1)
+            Watch.objects.filter(pk=watch.pk).update(next_check=self.now - timedelta(minutes=i))
+        self.future_watch = Watch.objects.create(name='future', url='http://example.com/future', xpath='/books[1]',
+                                                 period=timedelta(hours=1), owner=self.user1)
+
+    def test_claims_most_overdue_first(self):
+        scheduler = Scheduler(batch_size=3)
+
+        # select candidates, lease them, load leased rows
+        with self.assertNumQueries(3):
+            watches = scheduler.claim_due(self.now)
+
+        self.assertEqual([watch.name for watch in watches], ['watch4', 'watch3', 'watch2'])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_advance_uses_single_query(self):
+        scheduler = Scheduler(jitter=0)
+        watches = scheduler.claim_due(self.now)
+
+        with self.assertNumQueries(1):
+            scheduler.advance(watches, self.now)
+
+        self.assertEqual(scheduler.claim_due(self.now), [])
+        for watch in Watch.objects.exclude(pk=self.future_watch.pk):
+            self.assertEqual(watch.next_check, self.now + timedelta(hours=1))
+
+    def test_failures_back_off_next_check(self):
+        scheduler = Scheduler(jitter=0, max_backoff=timedelta(hours=6))
+        watches = scheduler.claim_due(self.now)
+        for failures, watch in enumerate(watches):
+            watch.failures = failures
+
+        scheduler.advance(watches, self.now, retry_after={watches[0].pk: 3 * 60 * 60})
+
+        delays = [Watch.objects.get(pk=watch.pk).next_check - self.now for watch in watches]
+        self.assertEqual(delays, [timedelta(hours=hours) for hours in (3, 2, 4, 6, 6)])
+        self.assertEqual(Watch.objects.get(pk=watches[4].pk).failures, 4)
+
+    def test_deferred_watches_are_due_after_retry_after(self):
+        scheduler = Scheduler(jitter=0)
+        watches = scheduler.claim_due(self.now)
+
+        scheduler.advance(watches, self.now, retry_after={watches[0].pk: 30}, deferred={watches[0].pk, watches[1].pk})
+
+        delays = [Watch.objects.get(pk=watch.pk).next_check - self.now for watch in watches]
+        self.assertEqual(delays, [timedelta(seconds=30), timedelta(0)] + [timedelta(hours=1)] * 3)
+
+    def test_jitter_is_bounded(self):
+        scheduler = Scheduler(jitter=0.1, max_jitter=timedelta(minutes=2))
+        scheduler.advance(scheduler.claim_due(self.now), self.now)
+
+        for watch in Watch.objects.exclude(pk=self.future_watch.pk):
+            self.assertGreaterEqual(watch.next_check, self.now + timedelta(hours=1))
+            self.assertLessEqual(watch.next_check, self.now + timedelta(hours=1, minutes=2))
+
+
+class SchedulerLeaseTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.now = timezone.now()
+        for i in range(5):
+            watch = Watch.objects.create(name='watch{}'.format(i), url='http://example.com/test{}'.format(i),
+                                         xpath='/books[1]', period=timedelta(hours=1), owner=self.user1)
+            Watch.objects.filter(pk=watch.pk).update(next_check=self.now - timedelta(minutes=i))
+
+    def test_workers_never_claim_same_watch(self):
+        worker1 = Scheduler(batch_size=3, worker='worker1')
+        worker2 = Scheduler(batch_size=3, worker='worker2')
+
+        claimed1 = worker1.claim_due(self.now)
+        claimed2 = worker2.claim_due(self.now)
+
+        self.assertEqual(len(claimed1), 3)
+        self.assertEqual(len(claimed2), 2)
+        self.assertFalse({watch.pk for watch in claimed1} & {watch.pk for watch in claimed2})
+        self.assertEqual(worker1.claim_due(self.now), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        crashed = Scheduler(worker='crashed', lease=timedelta(minutes=5))
+        crashed.claim_due(self.now)
+
+        worker = Scheduler(worker='worker')
+        self.assertEqual(worker.claim_due(self.now), [])
+        self.assertEqual(len(worker.claim_due(self.now + timedelta(minutes=6))), 5)
+
+    def test_advance_releases_lease(self):
+        worker = Scheduler(worker='worker', jitter=0)
+        worker.advance(worker.claim_due(self.now), self.now)
+
+        for watch in Watch.objects.all():
+            self.assertEqual(watch.lease_owner, "")
+            self.assertIsNone(watch.lease_expires)
+            self.assertEqual(watch.next_check, self.now + timedelta(hours=1))
+
+    def test_advance_skips_watches_leased_by_another_worker(self):
+        slow = Scheduler(worker='slow', lease=timedelta(minutes=5))
+        watches = slow.claim_due(self.now)
+        later = self.now + timedelta(minutes=6)
+        Scheduler(worker='other').claim_due(later)
+
+        slow.advance(watches, later)
+
+        self.assertEqual(Watch.objects.filter(lease_owner='other').count(), 5)
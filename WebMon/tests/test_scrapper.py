@@ -1,7 +1,8 @@
 import os
-from unittest import TestCase, skip
+from unittest import TestCase, mock, skip
 
-from ..scrapper import Scrapper
+from .. import scrapper as scrapper_module
+from ..scrapper import Scrapper, StreamScrapper, ContentTooLarge, compile_xpath, iter_chunks, stream_values
 
 
 @skip
@@ -46,3 +47,86 @@ class ScrapperTest(TestCase):
         xpath = '//*[@class="version"]/text()'
         scrapper = Scrapper(content=self.test_html, xpath=xpath)
         scrapper.save_value()
+
+
+class ScrapperCacheTest(TestCase):
+    def setUp(self):
+        test_file_name = os.path.join(os.path.dirname(__file__), 'test_files/test1.html')
+        self.test_html = open(test_file_name).read()
+
+    def test_tree_is_parsed_once_per_content(self):
+        scrapper = Scrapper(content=self.test_html, xpath='//*[@class="version"]/text()')
+        scrapper.get_value()
+        tree = scrapper._tree
+
+        scrapper.set_xpath('//*[@class="revision"]/strong/text()')
+        self.assertEqual(scrapper.get_value(), '1-3')
+        self.assertIs(scrapper._tree, tree)
+
+        scrapper.set_content('<html><body><div class="revision"><strong>2-0</strong></div></body></html>')
+        self.assertEqual(scrapper.get_value(), '2-0')
+        self.assertIsNot(scrapper._tree, tree)
+
+    def test_compiled_xpath_is_reused(self):
+        xpath = '//*[@class="version"]/text()'
+        self.assertIs(compile_xpath(xpath), compile_xpath(xpath))
+
+    def test_many_values_are_extracted_at_once(self):
+        scrapper = Scrapper(content=self.test_html)
+        values = scrapper.get_values(['//*[@class="version"]/text()', '//*[@class="revision"]/strong/text()'])
+        self.assertEqual(values, ['2.3.7', '1-3'])
+
+
+class StreamScrapperTest(TestCase):
+    def setUp(self):
+        rows = ''.join('<div class="row"><span class="item">{}</span></div>'.format(i) for i in range(2000))
+        self.page = '<html><body>{}</body></html>'.format(rows).encode()
+
+    def test_values_match_full_parse(self):
+        xpaths = ['//*[@class="item"]/text()', '(//*[@class="item"])[3]/text()']
+        values = stream_values(iter_chunks(self.page, 1024), xpaths)
+
+        self.assertEqual(values, Scrapper(content=self.page.decode()).get_values(xpaths))
+
+    def test_positioned_match_stops_early(self):
+        scrapper = StreamScrapper(['(//*[@class="item"]/text())[5]'])
+        chunks = list(iter_chunks(self.page, 1024))
+        fed = 0
+        for chunk in chunks:
+            fed += 1
+            if scrapper.feed(chunk):
+                break
+
+        self.assertLess(fed, len(chunks))
+        self.assertEqual(scrapper.get_values(), ['4'])
+
+    def test_text_of_positioned_match_stops_early(self):
+        scrapper = StreamScrapper(['(//*[@class="item"])[5]/text()', '(//*[@class="row"])[2]/@class'])
+        chunks = list(iter_chunks(self.page, 1024))
+
+        self.assertTrue(any(scrapper.feed(chunk) for chunk in chunks))
+        self.assertLess(scrapper.size, len(self.page))
+        self.assertEqual(scrapper.get_values(), ['4', 'row'])
+
+    def test_matches_are_looked_for_at_doubling_sizes(self):
+        scrapper = StreamScrapper(['(//*[@class="missing"])[1]'])
+        chunks = list(iter_chunks(self.page, 1024))
+
+        with mock.patch.object(scrapper_module, 'compile_xpath', wraps=compile_xpath) as compiled:
+            for chunk in chunks:
+                scrapper.feed(chunk)
+
+        # At 1 kB, 2 kB, 4 kB, ... of the page, instead of after every chunk
+        self.assertLessEqual(compiled.call_count, len(chunks).bit_length())
+        self.assertEqual(scrapper.get_values(), [''])
+
+    def test_unpositioned_match_reads_whole_page(self):
+        scrapper = StreamScrapper(['//*[@class="item"]/text()'])
+        self.assertFalse(any(scrapper.feed(chunk) for chunk in iter_chunks(self.page, 1024)))
+        self.assertEqual(len(scrapper.get_values()[0].split()), 2000)
+
+    def test_max_size_is_enforced(self):
+        scrapper = StreamScrapper(['//*[@class="item"]/text()'], max_size=4096)
+        with self.assertRaises(ContentTooLarge):
+            for chunk in iter_chunks(self.page, 1024):
+                scrapper.feed(chunk)
@@ -0,0 +1,162 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache.backends.db import DatabaseCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import streaming
+from ..cache import VERSION_KEY, get_watch_versions
+from ..models import Watch, Value
+from ..serializers import ValueSerializer
+from ..streaming import value_events
+from .helpers import LOCMEM_CACHES
+
+
+def parse_events(body: str) -> list:
+    """ Return (id, event, data) of server-sent events in `body`. """
+    events = []
+    for message in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(':'))
+        if 'data' in fields:
+            events.append((int(fields['id']), fields['event'], fields['data']))
+    return events
+
+
+class ValueEventsTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+
+    def test_values_arriving_while_open_are_pushed(self):
+        first = Value.objects.create(watch=self.watch1, content='2.3.7')
+        clock = iter(range(100))
+
+        def sleep(seconds):
+            Value.objects.create(watch=self.watch1, content='2.4.5')
+
+        events = value_events([self.watch1.pk], first.pk, ValueSerializer.Meta.fields, timeout=3, interval=1,
+                              sleep=sleep, clock=lambda: next(clock))
+        pushed = parse_events(''.join(events))
+
+        self.assertEqual(len(pushed), Value.objects.count() - 1)
+        self.assertEqual([event for _, event, _ in pushed], ['value'] * len(pushed))
+        self.assertEqual([event_id for event_id, _, _ in pushed],
+                         list(Value.objects.exclude(pk=first.pk).order_by('pk').values_list('pk', flat=True)))
+
+    def test_values_ingested_by_another_process_are_pushed(self):
+        # Cache instance of the fetching process, writes without signals as the ingester does
+        fetcher_cache = DatabaseCache(settings.CACHES['default']['LOCATION'], {})
+        clock = iter(range(100))
+
+        def sleep(seconds):
+            if not Value.objects.exists():
+                Value.objects.bulk_create([Value(watch=self.watch1, content='2.3.7', created=timezone.now())])
+                fetcher_cache.delete_many([VERSION_KEY.format(self.watch1.pk)])
+
+        events = value_events([self.watch1.pk], 0, ['content'], timeout=3, interval=1,
+                              sleep=sleep, clock=lambda: next(clock))
+
+        self.assertEqual([data for _, _, data in parse_events(''.join(events))], ['{"content": "2.3.7"}'])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_unchanged_watches_are_not_queried(self):
+        Value.objects.create(watch=self.watch1, content='2.3.7')
+        clock = iter(range(100))
+        events = value_events([self.watch1.pk], 0, ['id'], timeout=5, interval=1,
+                              sleep=lambda seconds: None, clock=lambda: next(clock))
+
+        # first look queries values, the following ones only compare cache versions
+        with self.assertNumQueries(1):
+            self.assertEqual(len(parse_events(''.join(events))), 1)
+
+    def test_versions_of_many_watches_are_looked_up_in_turns(self):
+        watches = [Watch.objects.create(name='watch{}'.format(i), url='http://example.com/test{}'.format(i),
+                                        xpath='/books[1]', period=timedelta(hours=5), owner=self.user1)
+                   for i in range(5)]
+        clock = iter(range(100))
+
+        def sleep(seconds):
+            if not Value.objects.exists():
+                Value.objects.create(watch=watches[-1], content='2.3.7')
+
+        with mock.patch.object(streaming, 'get_watch_versions', wraps=get_watch_versions) as lookup:
+            events = list(value_events([watch.pk for watch in watches], 0, ['content'], timeout=6, interval=1,
+                                       max_watches=2, sleep=sleep, clock=lambda: next(clock)))
+
+        self.assertEqual([data for _, _, data in parse_events(''.join(events))], ['{"content": "2.3.7"}'])
+        self.assertEqual({len(args[0]) for args, _ in lookup.call_args_list}, {1, 2})
+
+    def test_heartbeat_is_sent_when_quiet(self):
+        clock = iter(range(100))
+        events = value_events([self.watch1.pk], 0, ['id'], timeout=10, interval=1, heartbeat=4,
+                              sleep=lambda seconds: None, clock=lambda: next(clock))
+
+        self.assertIn(': heartbeat', ''.join(events))
+
+
+@override_settings(WEBMON_PUSH_TIMEOUT=0, WEBMON_PUSH_INTERVAL=0)
+class ValueStreamViewsTest(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.user2 = User.objects.create(username='second_user', password='test_test')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        self.watch2 = Watch.objects.create(name='watch2', url='http://example.com/test2', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        self.other_watch = Watch.objects.create(name='watch3', url='http://example.com/test3', xpath='/books[1]',
+                                                period=timedelta(hours=5), notify=False, owner=self.user2)
+        self.value1 = Value.objects.create(watch=self.watch1, content='2.3.7')
+        self.value2 = Value.objects.create(watch=self.watch2, content='1-3')
+        self.value3 = Value.objects.create(watch=self.other_watch, content='0.1')
+        self.value4 = Value.objects.create(watch=self.watch1, content='2.4.5')
+
+    def stream(self, url, **kwargs):
+        response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_events(b''.join(response.streaming_content).decode())
+
+    def test_watch_stream_since_cursor(self):
+        self.client.force_login(self.user1)
+        url = reverse('watch-value-stream', kwargs={'pk': self.watch1.pk})
+
+        events = self.stream(url + '?since={}'.format(self.value1.pk))
+
+        self.assertEqual([event_id for event_id, _, _ in events], [self.value4.pk])
+        self.assertIn('2.4.5', events[0][2])
+
+    def test_watch_stream_starts_after_latest_value(self):
+        self.client.force_login(self.user1)
+
+        events = self.stream(reverse('watch-value-stream', kwargs={'pk': self.watch1.pk}))
+
+        self.assertEqual(events, [])
+
+    def test_user_stream_resumes_from_last_event_id(self):
+        self.client.force_login(self.user1)
+
+        events = self.stream(reverse('value-stream') + '?fields=id,watch', HTTP_LAST_EVENT_ID='0')
+
+        self.assertEqual([event_id for event_id, _, _ in events], [self.value1.pk, self.value2.pk, self.value4.pk])
+        self.assertEqual(events[1][2], '{"id": %d, "watch": %d}' % (self.value2.pk, self.watch2.pk))
+
+    def test_watch_stream_wrong_user(self):
+        self.client.force_login(self.user2)
+
+        response = self.client.get(reverse('watch-value-stream', kwargs={'pk': self.watch1.pk}))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_cursor(self):
+        self.client.force_login(self.user1)
+
+        response = self.client.get(reverse('value-stream'), {'since': 'yesterday'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,7 +1,13 @@
+import hashlib
+import json
+import re
 from datetime import timedelta
 
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -71,3 +77,150 @@ class GetWatchValues(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_latest_value_of_watch_without_values(self):
+        watch2 = Watch.objects.create(name='watch2', url='http://example.com/test2', xpath='/books[2]',
+                                      period=timedelta(hours=5), notify=False, owner=self.user1)
+        url = reverse('watch-value-latest', kwargs={'pk': watch2.pk})
+
+        self.client.force_login(self.user1)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_new_value_becomes_latest(self):
+        self.watch1.refresh_from_db()
+        self.assertEqual(self.watch1.latest_value, self.value2)
+
+        value3 = Value.objects.create(watch=self.watch1, content="2.5.0")
+        self.watch1.refresh_from_db()
+        self.assertEqual(self.watch1.latest_value, value3)
+
+
+class PaginateWatchValues(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        self.start = timezone.now() - timedelta(days=1)
+        self.values = []
+        for i in range(5):
+            value = Value.objects.create(watch=self.watch1, content=str(i))
+            Value.objects.filter(pk=value.pk).update(created=self.start + timedelta(hours=i))
+            self.values.append(value.pk)
+        self.url = reverse('watch-value-list', kwargs={'pk': self.watch1.pk})
+        self.client.force_login(self.user1)
+
+    def test_pages_are_followed_by_cursor(self):
+        response = self.client.get(self.url, {'limit': 2})
+        pages = [[value['id'] for value in response.data]]
+        while 'Link' in response:
+            next_url = re.match('<(.*)>; rel="next"', response['Link']).group(1)
+            response = self.client.get(next_url)
+            pages.append([value['id'] for value in response.data])
+
+        self.assertEqual(pages, [self.values[0:2], self.values[2:4], self.values[4:5]])
+
+    def test_values_are_filtered_by_time_range(self):
+        response = self.client.get(self.url, {'since': (self.start + timedelta(hours=1)).isoformat(),
+                                              'until': (self.start + timedelta(hours=3)).isoformat()})
+
+        self.assertEqual([value['id'] for value in response.data], self.values[1:4])
+        self.assertNotIn('Link', response)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({'limit': 'all'}, {'limit': 0}, {'cursor': 'nonsense'}, {'since': 'yesterday'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class ExportWatchValues(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.user2 = User.objects.create(username='second_user', password='test_test')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        for i in range(3):
+            Value.objects.create(watch=self.watch1, content=str(i))
+        self.expected = json.loads(json.dumps(ValueSerializer(self.watch1.values.order_by('created'), many=True).data))
+
+    def export(self, export_format):
+        url = reverse('watch-value-export', kwargs={'pk': self.watch1.pk, 'export_format': export_format})
+        return self.client.get(url)
+
+    def test_export_json(self):
+        self.client.force_login(self.user1)
+        response = self.export('json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content).decode()), self.expected)
+
+    def test_export_ndjson(self):
+        self.client.force_login(self.user1)
+        response = self.export('ndjson')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected)
+
+    def test_export_empty_history(self):
+        self.watch1.values.all().delete()
+        self.client.force_login(self.user1)
+        response = self.export('json')
+
+        self.assertEqual(json.loads(b''.join(response.streaming_content).decode()), [])
+
+    def test_export_wrong_user(self):
+        self.client.force_login(self.user2)
+        response = self.export('json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ValueListingFields(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        self.value1 = Value.objects.create(watch=self.watch1, content="2.3.7")
+        self.value2 = Value.objects.create(watch=self.watch1, content="2.4.5")
+        self.client.force_login(self.user1)
+
+    def get(self, name, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, kwargs={'pk': self.watch1.pk}), params)
+        self.assertFalse([query for query in queries if '"content"' in query['sql']])
+        return response
+
+    def test_list_summary(self):
+        response = self.get('watch-value-list', fields='id,created,length,digest')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([list(item) for item in response.data], [['id', 'created', 'length', 'digest']] * 2)
+        self.assertEqual(response.data[1]['id'], self.value2.pk)
+        self.assertEqual(response.data[1]['length'], 5)
+        self.assertEqual(response.data[1]['digest'], hashlib.sha256(b'2.4.5').hexdigest())
+
+    def test_list_fields_keep_pagination(self):
+        response = self.get('watch-value-list', fields='checks_count', limit=1)
+
+        self.assertEqual(response.data, [{'checks_count': 1}])
+        self.assertIn('Link', response)
+
+    def test_latest_summary(self):
+        response = self.get('watch-value-latest', fields='created,digest')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': ValueSerializer(self.value2).data['created'],
+                                         'digest': hashlib.sha256(b'2.4.5').hexdigest()})
+
+    def test_latest_content_field(self):
+        response = self.client.get(reverse('watch-value-latest', kwargs={'pk': self.watch1.pk}), {'fields': 'content'})
+
+        self.assertEqual(response.data, {'content': '2.4.5'})
+
+    def test_unknown_field(self):
+        response = self.get('watch-value-list', fields='id,size')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
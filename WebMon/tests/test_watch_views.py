@@ -2,6 +2,7 @@ from datetime import timedelta, datetime
 
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -245,3 +246,87 @@ class DeleteWatchTest(APITestCase):
         response = self.client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkWatchTest(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create(username='test_user', password='test_pass')
+        self.user2 = User.objects.create(username='another_user', password='pass_pass')
+        self.watch1 = Watch.objects.create(name='watch1', url='http://example.com/test1', xpath='/books[1]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user1)
+        self.watch2 = Watch.objects.create(name='watch2', url='http://example.com/test2', xpath='/books[2]',
+                                           period=timedelta(hours=5), notify=False, owner=self.user2)
+        self.url = reverse('watch-bulk')
+        self.client.force_login(self.user1)
+
+    def new_watch_data(self, i):
+        return {'name': 'bulk{}'.format(i), 'url': 'http://example.com/bulk{}'.format(i), 'xpath': '/books[1]',
+                'period': '01:00:00', 'notify': False}
+
+    def test_bulk_create(self):
+        before = timezone.now()
+        response = self.client.post(self.url, [self.new_watch_data(i) for i in range(50)])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual([watch['name'] for watch in response.data], ['bulk{}'.format(i) for i in range(50)])
+        watches = Watch.objects.filter(name__startswith='bulk')
+        self.assertEqual(set(watch['id'] for watch in response.data), set(watches.values_list('pk', flat=True)))
+        for watch in watches:
+            self.assertEqual(watch.owner, self.user1)
+            self.assertGreaterEqual(watch.next_check, before + timedelta(hours=1))
+
+    def test_bulk_create_is_validated_together(self):
+        items = [self.new_watch_data(i) for i in range(3)]
+        items[1]['url'] = ''
+
+        response = self.client.post(self.url, items)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('url', response.data[1])
+        self.assertEqual(Watch.objects.filter(name__startswith='bulk').count(), 0)
+
+    def test_bulk_update(self):
+        Watch.objects.filter(pk=self.watch1.pk).update(content_hash='abc')
+        data = dict(self.new_watch_data(1), id=self.watch1.pk)
+
+        response = self.client.put(self.url, [data])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.watch1.refresh_from_db()
+        self.assertEqual(self.watch1.name, 'bulk1')
+        self.assertEqual(self.watch1.period, timedelta(hours=1))
+        self.assertEqual(self.watch1.content_hash, '')
+
+    def test_bulk_update_foreign_watch(self):
+        data = dict(self.new_watch_data(1), id=self.watch2.pk)
+
+        response = self.client.put(self.url, [data])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.watch2.refresh_from_db()
+        self.assertEqual(self.watch2.name, 'watch2')
+
+    def test_bulk_update_rejects_bool_id(self):
+        data = dict(self.new_watch_data(1), id=True)
+
+        response = self.client.put(self.url, [data])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.watch1.refresh_from_db()
+        self.assertEqual(self.watch1.name, 'watch1')
+
+    def test_bulk_delete_only_own_watches(self):
+        response = self.client.delete(self.url, {'ids': [self.watch1.pk, self.watch2.pk]})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], [self.watch1.pk])
+        self.assertEqual(list(Watch.objects.all()), [self.watch2])
+
+    def test_bulk_delete_invalid_ids(self):
+        for ids in (['abc'], [{}], [True], [self.watch1.pk, None]):
+            response = self.client.delete(self.url, {'ids': ids})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ids', response.data)
+        self.assertEqual(Watch.objects.count(), 2)
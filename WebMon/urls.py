@@ -4,9 +4,14 @@ from . import views
 
 urlpatterns_v1 = [
     url(r'^watches/$', views.watch_list, name='watch-list'),
+    url(r'^watches/bulk$', views.watch_bulk, name='watch-bulk'),
+    url(r'^watches/stream$', views.value_stream, name='value-stream'),
     url(r'^watches/(?P<pk>[0-9]+)$', views.watch_detail, name='watch-detail'),
     url(r'^watches/(?P<pk>[0-9]+)/value$', views.watch_value_latest, name='watch-value-latest'),
     url(r'^watches/(?P<pk>[0-9]+)/value/all$', views.watch_value_list, name='watch-value-list'),
+    url(r'^watches/(?P<pk>[0-9]+)/value/stream$', views.watch_value_stream, name='watch-value-stream'),
+    url(r'^watches/(?P<pk>[0-9]+)/value/export\.(?P<export_format>json|ndjson)$', views.watch_value_export,
+        name='watch-value-export'),
 
     # url(r'^users/$', views.user_list, name='user-list'),
     # url(r'^users/(?P<pk>[0-9]+)$', views.user_detail, name='user-detail'),
@@ -1,21 +1,32 @@
+import json
+
 from django.contrib.auth.models import User
-from rest_framework import status
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import serializers, status
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
+from .cache import cache_watch_response, etag_response, invalidate_watches
+from .db import bulk_update
 from .models import Watch, Value
-from .serializers import WatchSerializer, ValueSerializer
+from .pagination import ValuePagination
+from .serializers import WatchSerializer, ValueSerializer, WATCH_ROW_FIELDS, VALUE_ROW_FIELDS, VALUE_LISTING_FIELDS, \
+    watch_row_data, value_row_data, get_value_row_columns
+from .streaming import value_events
 
 
 @api_view(['GET', 'POST'])
 @permission_classes((IsAuthenticated,))
 def watch_list(request):
     if request.method == 'GET':
-        watches = request.user.watches.all()
-        serializer = WatchSerializer(watches, many=True)
-        return Response(serializer.data)
+        rows = request.user.watches.values(*WATCH_ROW_FIELDS)
+        return Response([watch_row_data(row) for row in rows])
 
     if request.method == 'POST':
         serializer = WatchSerializer(data=request.data)
@@ -25,15 +36,109 @@ def watch_list(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+MAX_BULK_SIZE = 10000
+
+
+@api_view(['POST', 'PUT', 'DELETE'])
+@permission_classes((IsAuthenticated,))
+def watch_bulk(request):
+    """ Create (POST), update (PUT) or delete (DELETE) many watches at once.
+
+    POST takes a list of watches, PUT a list of watches with their `id`s, DELETE an object with list of `ids`.
+    Whole request is validated first and then written in a single transaction.
+    """
+    if request.method == 'DELETE':
+        items = request.data.get('ids') if hasattr(request.data, 'get') else None
+    else:
+        items = request.data
+    if not isinstance(items, list):
+        return Response({'non_field_errors': ['Expected a list.']}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_BULK_SIZE:
+        return Response({'non_field_errors': ['At most {} items are allowed.'.format(MAX_BULK_SIZE)]},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if request.method == 'POST':
+        return _bulk_create(request, items)
+    elif request.method == 'PUT':
+        return _bulk_update(request, items)
+    elif request.method == 'DELETE':
+        return _bulk_delete(request, items)
+
+
+def _bulk_create(request, items):
+    serializer = WatchSerializer(data=items, many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # bulk_create() skips Watch.save(), so next_check is set here
+    now = timezone.now()
+    watches = [Watch(owner=request.user, **dict(data, next_check=now + data['period']))
+               for data in serializer.validated_data]
+    with transaction.atomic():
+        Watch.objects.bulk_create(watches, batch_size=500)
+        if watches and watches[0].pk is None:
+            # Backend does not return primary keys of inserted rows, our rows are the newest ones
+            watches = list(reversed(request.user.watches.order_by('-pk')[:len(watches)]))
+
+    return Response(WatchSerializer(watches, many=True).data, status=status.HTTP_201_CREATED)
+
+
+def _bulk_update(request, items):
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    # bool is an int too, but True is no id of a watch
+    watches = request.user.watches.in_bulk([pk for pk in ids if isinstance(pk, int) and not isinstance(pk, bool)])
+    if len(watches) != len(set(ids)) or len(ids) != len(set(ids)):
+        return Response({'id': ['Every item needs a unique id of an own watch.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    item_serializers = [WatchSerializer(watches[pk], data=item) for pk, item in zip(ids, items)]
+    valid = [serializer.is_valid() for serializer in item_serializers]
+    if not all(valid):
+        return Response([serializer.errors for serializer in item_serializers], status=status.HTTP_400_BAD_REQUEST)
+
+    fields = set(Watch.VALIDATOR_FIELDS)
+    for serializer in item_serializers:
+        watch = serializer.instance
+        for name, value in serializer.validated_data.items():
+            setattr(watch, name, value)
+            fields.add(name)
+        # Same as Watch.save(), validators of a different URL or expression must be dropped
+        if watch.source_changed():
+            watch.reset_validators()
+
+    with transaction.atomic():
+        bulk_update(watches.values(), fields)
+    invalidate_watches(watches.keys())
+
+    return Response([serializer.data for serializer in item_serializers])
+
+
+def _bulk_delete(request, ids):
+    try:
+        ids = serializers.ListField(child=serializers.IntegerField()).run_validation(ids)
+    except ValidationError as e:
+        return Response({'ids': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        deleted = list(request.user.watches.filter(pk__in=ids).values_list('pk', flat=True))
+        request.user.watches.filter(pk__in=deleted).delete()
+    invalidate_watches(deleted)
+
+    return Response({'deleted': deleted})
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes((IsAuthenticated,))
+@etag_response
 def watch_detail(request, pk):
     try:
-        watch = Watch.objects.get(pk=pk)
+        # Owner is serialized by username
+        watch = Watch.objects.select_related('owner').get(pk=pk)
     except Watch.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if request.user != watch.owner:
+    # Comparing ids, owner of a foreign watch is not loaded
+    if watch.owner_id != request.user.pk:
         return Response(status=status.HTTP_401_UNAUTHORIZED)
 
     if request.method == 'GET':
@@ -54,16 +159,27 @@ def watch_detail(request, pk):
 
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
+@etag_response
 def watch_value_latest(request, pk):
+    fields = _get_value_fields(request)
+    watches = Watch.objects.select_related('latest_value')
+    if fields is not None and 'content' not in fields:
+        watches = watches.defer('latest_value__content')
     try:
-        watch = Watch.objects.get(pk=pk)
+        watch = watches.get(pk=pk)
     except Watch.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if request.user != watch.owner:
+    if watch.owner_id != request.user.pk:
         return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-    value = watch.values.latest('created')
+    value = watch.latest_value
+    if value is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    if fields is not None:
+        row = {column: getattr(value, column) for column in get_value_row_columns(fields)}
+        return Response(value_row_data(row, fields))
 
     serializer = ValueSerializer(value)
 
@@ -71,16 +187,115 @@ def watch_value_latest(request, pk):
 
 
 @api_view(['GET'])
+@permission_classes((IsAuthenticated,))
+@cache_watch_response
 def watch_value_list(request, pk):
     try:
         watch = Watch.objects.get(pk=pk)
     except Watch.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    values = watch.values.all()
-    serializer = ValueSerializer(values, many=True)
+    if watch.owner_id != request.user.pk:
+        return Response(status=status.HTTP_401_UNAUTHORIZED)
 
-    return Response(serializer.data)
+    fields = _get_value_fields(request) or ValueSerializer.Meta.fields
+    pagination = ValuePagination(request)
+    # Pagination orders and continues by (`created`, `id`), whichever fields are returned
+    rows = pagination.paginate(watch.values.values(*{'id', 'created'} | set(get_value_row_columns(fields))))
+
+    return Response([value_row_data(row, fields) for row in rows], headers=pagination.get_headers())
+
+
+@api_view(['GET'])
+@permission_classes((IsAuthenticated,))
+def watch_value_stream(request, pk):
+    """ Push new values of a watch as server-sent events, see `WebMon.streaming.value_events`. """
+    try:
+        watch = Watch.objects.get(pk=pk)
+    except Watch.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    if watch.owner_id != request.user.pk:
+        return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+    since = _get_stream_since(request, watch.latest_value_id)
+    return _event_stream(value_events([watch.pk], since, _get_value_fields(request) or ValueSerializer.Meta.fields))
+
+
+@api_view(['GET'])
+@permission_classes((IsAuthenticated,))
+def value_stream(request):
+    """ Push new values of all watches of the user as server-sent events.
+
+    Watches created after the stream was opened are included once the client reconnects.
+    """
+    pks = list(request.user.watches.values_list('pk', flat=True))
+    latest = Value.objects.filter(watch__in=pks).order_by('-pk').values_list('pk', flat=True).first()
+    since = _get_stream_since(request, latest)
+    return _event_stream(value_events(pks, since, _get_value_fields(request) or ValueSerializer.Meta.fields))
+
+
+def _get_stream_since(request, latest) -> int:
+    """ Return value id after which a stream starts: `?since=`, `Last-Event-ID` of a reconnect, or `latest`. """
+    since = request.query_params.get('since', request.META.get('HTTP_LAST_EVENT_ID'))
+    if since is None:
+        return latest or 0
+    try:
+        return int(since)
+    except ValueError:
+        raise ValidationError({'since': ['A valid integer is required.']})
+
+
+def _event_stream(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _get_value_fields(request):
+    """ Return value fields requested with `?fields=id,created,...`, None when the parameter is missing.
+
+    Unless `content` is requested, the content column is not read at all.
+    """
+    if 'fields' not in request.query_params:
+        return None
+    fields = [name for name in request.query_params['fields'].split(',') if name]
+    if not fields or any(name not in VALUE_LISTING_FIELDS for name in fields):
+        raise ValidationError({'fields': ['Choose some of: {}.'.format(', '.join(VALUE_LISTING_FIELDS))]})
+    return fields
+
+
+@api_view(['GET'])
+@permission_classes((IsAuthenticated,))
+def watch_value_export(request, pk, export_format):
+    """ Stream whole value history of a watch as a JSON array or as newline delimited JSON. """
+    try:
+        watch = Watch.objects.get(pk=pk)
+    except Watch.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    if watch.owner_id != request.user.pk:
+        return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+    rows = watch.values.order_by('created', 'pk').values(*VALUE_ROW_FIELDS).iterator()
+    if export_format == 'ndjson':
+        return StreamingHttpResponse(_ndjson_stream(rows), content_type='application/x-ndjson')
+    return StreamingHttpResponse(_json_array_stream(rows), content_type='application/json')
+
+
+def _ndjson_stream(rows):
+    for row in rows:
+        yield json.dumps(value_row_data(row), cls=JSONEncoder) + '\n'
+
+
+def _json_array_stream(rows):
+    separator = '['
+    for row in rows:
+        yield separator + json.dumps(value_row_data(row), cls=JSONEncoder)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
 
 
 # def user_list(request):
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 """
 
 import os
+from datetime import timedelta
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -120,6 +121,27 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Cache
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+# Watch responses are invalidated from `fetch_watches` and other web workers, so the cache has to be
+# shared by all processes, not locmem. Use memcached or redis in production, e.g. memcached with
+#     'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache', 'LOCATION': '127.0.0.1:11211'
+# (needs python-memcached) or redis with django-redis. The database cache below is a fallback which
+# needs no extra service (run `manage.py createcachetable`), but each lookup is a query. That is why
+# only value listings are cached, single rows are cheaper to load than to look up.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'webmon_cache',
+        # Entries are kept per watch, user and request path, culling them often would drop watch versions too
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
+    }
+}
+
 REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -127,3 +149,35 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
     )
 }
+
+# WebMon
+
+# Store a new Value on every check ('all'). Set to 'changes' to opt in to storing a new Value only when
+# the extracted content changes, repeated checks then bump `last_seen` and `checks_count` of the latest one
+WEBMON_VALUE_STORAGE = 'all'
+
+# How long watch API responses are cached, in seconds. Entries are invalidated on changes anyway
+WEBMON_CACHE_TIMEOUT = 300
+
+# Fetched pages larger than this many bytes are parsed incrementally
+WEBMON_STREAM_THRESHOLD = 1024 * 1024
+
+# Value contents of this many characters or more are stored zlib compressed, None disables compression
+WEBMON_COMPRESS_THRESHOLD = 4096
+
+# Notifications wait this long for further changes of the watch, which they report together
+WEBMON_NOTIFY_WINDOW = timedelta(minutes=5)
+
+# Value streams are held open this many seconds and look for new values every WEBMON_PUSH_INTERVAL seconds.
+# Each look is a cache lookup of versions of up to WEBMON_PUSH_MAX_WATCHES watches, taken in turns, which is
+# a query with the database cache
+WEBMON_PUSH_TIMEOUT = 300
+WEBMON_PUSH_INTERVAL = 5
+WEBMON_PUSH_MAX_WATCHES = 100
+
+# Value history kept by `prune_values` as (max age, resolution) tiers, see WebMon.retention.RetentionPolicy
+WEBMON_VALUE_RETENTION = [
+    (timedelta(days=7), None),
+    (timedelta(days=30), timedelta(hours=1)),
+    (timedelta(days=365), timedelta(days=1)),
+]